@@ -5,12 +5,17 @@ import signal
 import json
 
 # Third-party imports
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, abort, Response, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 
 # Local imports
 from file_handler import FileHandler
+from ocr_processing import warm_up_ocr_backend, get_ocr_backend_status
+from correction_log import get_corrected_json_name, get_log_path, validate_changes, append_changes, load_corrected_page
 from extraction_service import blueprint as extraction_service
+from profiling import blueprint as profiling_service
+from asset_serving import serve_asset
 
 # Constants and Configuration
 BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,12 +29,18 @@ app = Flask(__name__,
 
 # Set up file handler dirs in app config
 app.config['STEP_6_DIR'] = os.path.join(BACKEND_DIR, 'files_workflow', 'step_6_with_llm_structured_data')
+app.config['PROFILES_DIR'] = os.path.join(BACKEND_DIR, 'files_workflow', 'profiles')
+app.config['RESULT_DB'] = os.path.join(BACKEND_DIR, 'files_workflow', 'results.sqlite3')
 
 # Initialize Services
 file_handler = FileHandler(BACKEND_DIR)
 
+# Import the selected OCR backend in the background
+warm_up_ocr_backend()
+
 # Register Blueprints
 app.register_blueprint(extraction_service)
+app.register_blueprint(profiling_service)
 
 # Cleanup and Signal Handling
 def signal_handler(sig, frame):
@@ -49,8 +60,29 @@ def serve_index():
 @app.route('/preprocessed/<path:filename>')
 def serve_preprocessed(filename):
     """Serve files from the preprocessed directory (step 2)"""
-    preprocessed_dir = file_handler.preprocessed_dir
-    return send_from_directory(preprocessed_dir, filename)
+    return serve_asset(file_handler.preprocessed_dir, filename, 'preprocessed')
+
+@app.route('/ressources/<path:filename>')
+def serve_annotated(filename):
+    """Serve annotated page images from the frontend resources directory"""
+    return serve_asset(file_handler.static_resources_dir, filename, 'ressources')
+
+@app.route('/thumbnails/<path:filename>')
+def serve_thumbnail(filename):
+    """Serve a downscaled WebP version of a preprocessed image, creating it on first request"""
+    if safe_join(file_handler.preprocessed_dir, filename) is None:
+        abort(404)
+    
+    thumbnail_name = file_handler.save_thumbnail(filename)
+    if thumbnail_name is None:
+        abort(404)
+    return serve_asset(file_handler.thumbnails_dir, thumbnail_name, 'thumbnails')
+
+@app.route('/ready')
+def readiness():
+    """Readiness probe: succeeds once the selected OCR backend is imported"""
+    status = get_ocr_backend_status()
+    return jsonify(status), 200 if status['ready'] else 503
 
 # File Management Routes
 @app.route('/cleanup', methods=['POST'])
@@ -61,15 +93,22 @@ def cleanup():
 
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    """Handle file uploads and processing"""
+    """
+    Handle file uploads and processing
+    
+    With ?stream=1 (or Accept: application/x-ndjson) page results are streamed
+    as newline-delimited JSON while files are processed, instead of being
+    collected into one response.
+    """
     # Clean up before processing new files
     file_handler.cleanup_workflow_files()
+    file_handler.start_job()
     
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     
     files = request.files.getlist('file')
-    results = []
+    filepaths = []
     
     for file in files:
         if file.filename == '':
@@ -83,6 +122,21 @@ def upload_files():
         
         try:
             file.save(filepath)
+            filepaths.append(filepath)
+        except Exception as e:
+            app.logger.error(f"Error saving {filename}: {str(e)}")
+            return jsonify({'error': f'Error processing {filename}'}), 500
+    
+    if request.args.get('stream') == '1' or request.accept_mimetypes.best == 'application/x-ndjson':
+        return Response(
+            stream_with_context(stream_upload_results(filepaths)),
+            mimetype='application/x-ndjson'
+        )
+    
+    results = []
+    for filepath in filepaths:
+        filename = os.path.basename(filepath)
+        try:
             result = file_handler.process_file(filepath)
             results.append(result)
         except Exception as e:
@@ -94,6 +148,39 @@ def upload_files():
         'results': results
     })
 
+def stream_upload_results(filepaths):
+    """
+    Yield one JSON line per processed page, then one per file and a final summary
+    
+    Lines have a "type" of "page", "file", "error" or "done". Page results are
+    not kept after they are sent.
+    """
+    for filepath in filepaths:
+        filename = os.path.basename(filepath)
+        skipped_pages = []
+        page_count = 0
+        
+        try:
+            for page_result, skipped in file_handler.iter_file_pages(filepath):
+                if skipped:
+                    skipped_pages.append(skipped)
+                if page_result is not None:
+                    page_count += 1
+                    yield json.dumps({'type': 'page', 'filename': filename, 'page': page_result}, ensure_ascii=False) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error processing {filename}: {str(e)}")
+            yield json.dumps({'type': 'error', 'filename': filename, 'error': f'Error processing {filename}'}) + '\n'
+            return
+        
+        yield json.dumps({
+            'type': 'file',
+            'filename': filename,
+            'pages': page_count,
+            'skipped_pages': skipped_pages
+        }, ensure_ascii=False) + '\n'
+    
+    yield json.dumps({'type': 'done', 'success': True}) + '\n'
+
 # OCR Routes
 @app.route('/ocr/save-corrections', methods=['POST'])
 def save_corrections():
@@ -104,18 +191,23 @@ def save_corrections():
         page = data['page']
         
         # Create filename for corrected JSON
-        base_name = os.path.splitext(filename)[0]
-        if page > 1:
-            json_filename = f"{base_name}_page_{page}_ocr_corrected.json"
-        else:
-            json_filename = f"{base_name}_ocr_corrected.json"
-        
+        json_filename = get_corrected_json_name(filename, page)
         json_path = os.path.join(file_handler.confirmed_ocr_dir, json_filename)
         
         # Save corrected data
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
         
+        # A full save supersedes any logged changes
+        if os.path.exists(get_log_path(json_path)):
+            os.unlink(get_log_path(json_path))
+        
+        # Learn the report layout from the confirmed page
+        try:
+            file_handler.learn_template(filename, page, data['word_objects'])
+        except Exception as e:
+            app.logger.error(f"Error learning template from {filename}: {str(e)}")
+        
         return jsonify({
             'success': True,
             'message': 'Corrections saved successfully',
@@ -129,6 +221,59 @@ def save_corrections():
             'error': str(e)
         }), 500
 
+@app.route('/ocr/save-corrections', methods=['PATCH'])
+def patch_corrections():
+    """
+    Save only the changed words of a page
+    
+    Expected request format:
+    {
+        "filename": "report.pdf",
+        "page": 1,
+        "changes": [{"index": 12, "text": "corrected"}]
+    }
+    """
+    try:
+        data = request.json
+        filename = data['filename']
+        page = data['page']
+        changes = validate_changes(data['changes'])
+        
+        result = append_changes(
+            file_handler.confirmed_ocr_dir,
+            file_handler.processed_dir,
+            filename,
+            page,
+            changes
+        )
+        
+        # Learn the report layout when the page is first confirmed or compacted
+        if result['created'] or result['compacted']:
+            try:
+                page_data = load_corrected_page(result['json_path'])
+                file_handler.learn_template(filename, page, page_data['word_objects'])
+            except Exception as e:
+                app.logger.error(f"Error learning template from {filename}: {str(e)}")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Corrections saved successfully',
+            'path': result['json_path'],
+            'pending': result['pending']
+        })
+        
+    except (KeyError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        app.logger.error(f"Error saving corrections: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Main Entry Point
 if __name__ == '__main__':
     port = int(os.environ.get('FLASK_PORT', 8080))
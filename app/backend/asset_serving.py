@@ -0,0 +1,51 @@
+import re
+import mimetypes
+from flask import request, Response, send_from_directory, abort
+from werkzeug.security import safe_join
+from config import ASSET_CONFIG
+
+HASHED_NAME_PATTERN = re.compile(r'\.([0-9a-f]{%d})\.\w+$' % ASSET_CONFIG["HASH_LENGTH"])
+
+def set_cache_headers(response, content_hash):
+    """Mark content-hashed files as immutable, revalidate everything else"""
+    if content_hash:
+        response.set_etag(content_hash)
+        response.headers['Cache-Control'] = f"public, max-age={ASSET_CONFIG['IMMUTABLE_MAX_AGE']}, immutable"
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def serve_asset(directory, filename, location):
+    """
+    Serve an image from a workflow directory with cache headers
+
+    Files whose name carries a content hash get a strong ETag equal to the hash
+    and a one-year immutable Cache-Control. When USE_X_ACCEL is enabled the
+    file itself is sent by nginx through an X-Accel-Redirect to the internal
+    location "<X_ACCEL_PREFIX>/<location>/".
+
+    Args:
+        directory (str): Directory holding the file
+        filename (str): Requested filename
+        location (str): Name of the nginx internal location for this directory
+
+    Returns:
+        Response: File, X-Accel-Redirect or 304 response
+    """
+    if safe_join(directory, filename) is None:
+        abort(404)
+
+    match = HASHED_NAME_PATTERN.search(filename)
+    content_hash = match.group(1) if match else None
+
+    # The hash identifies the content, no need to touch the file
+    if content_hash and content_hash in request.if_none_match:
+        return set_cache_headers(Response(status=304), content_hash)
+
+    if ASSET_CONFIG["USE_X_ACCEL"]:
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{ASSET_CONFIG['X_ACCEL_PREFIX']}/{location}/{filename}"
+    else:
+        response = send_from_directory(directory, filename)
+
+    return set_cache_headers(response, content_hash)
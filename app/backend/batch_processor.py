@@ -0,0 +1,197 @@
+"""
+Command-line batch processing of report archives
+
+Walks a directory tree, runs every PDF and image through OCR and LLM extraction
+on all cores, and writes the extracted variables to a consolidated CSV and/or
+Parquet file. Progress is checkpointed after every file so an interrupted run
+can be resumed by running the same command again.
+
+Usage:
+    python batch_processor.py /data/echo_reports --output /data/extraction --workers 8
+"""
+# Standard library imports
+import os
+import csv
+import json
+import argparse
+import multiprocessing
+
+# Local imports
+from file_handler import FileHandler
+from extraction_service import load_ocr_data, extract_text_from_ocr, structure_document
+
+CHECKPOINT_FILENAME = 'checkpoint.jsonl'
+OUTPUT_COLUMNS = ['document', 'page', 'variable', 'value']
+
+# Set per worker process by init_worker
+worker_file_handler = None
+
+def find_documents(input_dir):
+    """List supported files below a directory, as paths relative to it"""
+    documents = []
+    for root, _, files in os.walk(input_dir):
+        for filename in files:
+            if FileHandler.handle_file_type(filename) != 'unknown':
+                documents.append(os.path.relpath(os.path.join(root, filename), input_dir))
+    return sorted(documents)
+
+def load_checkpoint(checkpoint_path):
+    """
+    Load the results of files already processed successfully
+
+    Args:
+        checkpoint_path (str): Path to the checkpoint file
+
+    Returns:
+        dict: Relative document path -> extracted rows
+    """
+    completed = {}
+    if not os.path.exists(checkpoint_path):
+        return completed
+
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by an interruption, the file will be processed again
+                continue
+            if entry['status'] == 'ok':
+                completed[entry['document']] = entry['rows']
+    return completed
+
+def init_worker(work_dir):
+    """Create a private workflow directory and file handler for a worker process"""
+    global worker_file_handler
+
+    # Tesseract would otherwise start one thread per core in every worker
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+    worker_dir = os.path.join(work_dir, f"worker_{os.getpid()}")
+    worker_file_handler = FileHandler(worker_dir, annotate=False)
+
+def process_document(args):
+    """
+    OCR and extract one document in a worker process
+
+    Args:
+        args (tuple): (input_dir, relative document path)
+
+    Returns:
+        dict: Checkpoint entry with status and extracted rows
+    """
+    input_dir, document = args
+    try:
+        result = worker_file_handler.process_file(os.path.join(input_dir, document))
+
+        rows = []
+        for page in result['pages']:
+            ocr_data = load_ocr_data(page['json_path'])
+            text = extract_text_from_ocr(ocr_data)
+            if not text:
+                continue
+
+            # A failed LLM call keeps the file for the next run, pages without values are fine
+            document_data = structure_document(ocr_data, text, result['filename'])
+            if document_data is None:
+                return {'document': document, 'status': 'error', 'error': f"LLM extraction failed on page {page['page']}"}
+
+            for field in document_data['fields']:
+                rows.append({
+                    'document': document,
+                    'page': page['page'],
+                    'variable': field['name'],
+                    'value': field['value']
+                })
+
+        return {'document': document, 'status': 'ok', 'rows': rows}
+
+    except Exception as e:
+        return {'document': document, 'status': 'error', 'error': str(e)}
+
+    finally:
+        worker_file_handler.cleanup_workflow_files()
+
+def write_csv(rows, path):
+    """Write extracted rows to a CSV file"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_parquet(rows, path):
+    """Write extracted rows to a Parquet file (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow: pip install pyarrow")
+
+    table = pa.Table.from_pylist(rows, schema=pa.schema([
+        ('document', pa.string()),
+        ('page', pa.int32()),
+        ('variable', pa.string()),
+        ('value', pa.string())
+    ]))
+    pq.write_table(table, path)
+
+def run_batch(input_dir, output_dir, workers, output_format):
+    """
+    Process all documents below input_dir, resuming from a previous checkpoint
+
+    Args:
+        input_dir (str): Directory tree with the reports
+        output_dir (str): Directory for the checkpoint and consolidated output
+        workers (int): Number of worker processes
+        output_format (str): "csv", "parquet" or "both"
+
+    Returns:
+        int: Number of documents that failed
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILENAME)
+    completed = load_checkpoint(checkpoint_path)
+
+    documents = find_documents(input_dir)
+    pending = [document for document in documents if document not in completed]
+    print(f"Found {len(documents)} documents, {len(completed)} already done, {len(pending)} to process")
+
+    failed = 0
+    if pending:
+        work_dir = os.path.join(output_dir, 'work')
+        with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                multiprocessing.Pool(workers, initializer=init_worker, initargs=(work_dir,)) as pool:
+            tasks = [(input_dir, document) for document in pending]
+            for count, entry in enumerate(pool.imap_unordered(process_document, tasks), 1):
+                checkpoint.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                checkpoint.flush()
+
+                if entry['status'] == 'ok':
+                    completed[entry['document']] = entry['rows']
+                else:
+                    failed += 1
+                    print(f"Error processing {entry['document']}: {entry['error']}")
+
+                print(f"[{count}/{len(pending)}] {entry['document']}: {entry['status']}")
+
+    # Consolidated output, in a stable document order
+    rows = [row for document in sorted(completed) for row in completed[document]]
+    if output_format in ('csv', 'both'):
+        write_csv(rows, os.path.join(output_dir, 'extracted_variables.csv'))
+    if output_format in ('parquet', 'both'):
+        write_parquet(rows, os.path.join(output_dir, 'extracted_variables.parquet'))
+
+    print(f"Wrote {len(rows)} rows from {len(completed)} documents to {output_dir} ({failed} failed)")
+    return failed
+
+# Main Entry Point
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Batch OCR and LLM extraction of echo report archives')
+    parser.add_argument('input_dir', help='Directory tree containing PDF and image reports')
+    parser.add_argument('--output', default='batch_output', help='Directory for checkpoint and results')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv', help='Output format')
+    args = parser.parse_args()
+
+    failed_count = run_batch(args.input_dir, args.output, args.workers, args.format)
+    raise SystemExit(1 if failed_count else 0)
@@ -0,0 +1,122 @@
+"""
+Prompt size and LLM latency with and without context selection
+
+Generates synthetic echo report pages (clinic header, patient data,
+measurements under configured and alternative label wordings, conclusion
+text), then compares the full page text with the text kept by
+select_context: estimated tokens, and whether every measurement value is
+still present. With --llm each page is also sent through structure_text in
+both modes, reporting the prompt tokens counted by the server and the
+latency of the call.
+
+Usage:
+    python bench_context_selection.py --pages 50
+    python bench_context_selection.py --pages 10 --llm
+"""
+# Standard library imports
+import random
+import argparse
+import statistics
+import time
+
+# Local imports
+import llm_processing
+from context_selection import select_context, estimate_tokens
+from config import CONTEXT_CONFIG
+
+HEADER_LINES = [
+    "Clinica Cardiologica Sao Lucas Rua das Flores 123 Centro",
+    "Tel (11) 5555-1234 www.clinicasaolucas.com.br",
+    "Paciente: Joao da Silva Idade: 54 anos Sexo: M",
+    "Data do exame 12/03/2024 Convenio 123456789 Atendimento 98765",
+    "Medico solicitante Dr. Carlos Souza CRM 45678",
+    "ECOCARDIOGRAMA TRANSTORACICO",
+]
+MEASUREMENTS = [
+    ("Aorta", "mm"), ("Atrio esquerdo", "mm"), ("Septo interventricular", "mm"),
+    ("Septo IV", "mm"), ("Parede posterior", "mm"), ("VE Diastolico", "mm"),
+    ("VE Sistolico", "mm"), ("VDF", "ml"), ("VSF", "ml"), ("Massa do VE", "g"),
+    ("Indice de massa", "g/m²"), ("Fracao de ejecao (Teichholz)", "%"),
+    ("FE Simpson", "%"), ("Velocidade E", "cm/s"), ("PSAP", "mmHg"),
+]
+TEXT_LINES = [
+    "Ventriculo esquerdo com dimensoes e espessuras parietais normais",
+    "Contratilidade segmentar preservada em repouso",
+    "Valvas atrioventriculares com morfologia e mobilidade normais",
+    "Ausencia de derrame pericardico",
+    "Conclusao: exame dentro dos limites da normalidade",
+    "Laudo assinado eletronicamente por Dra. Ana Lima CRM 12345",
+]
+
+def make_page(rng):
+    """Return the word objects of a synthetic report page and its measurement lines"""
+    measurement_lines = [f"{label}: {rng.uniform(5, 150):.1f} {unit}".replace('.', ',', 1)
+                         for label, unit in rng.sample(MEASUREMENTS, rng.randint(8, len(MEASUREMENTS)))]
+    lines = HEADER_LINES + measurement_lines + rng.sample(TEXT_LINES, 4) + TEXT_LINES[-2:]
+
+    word_objects = []
+    for line_index, line in enumerate(lines):
+        x = 40
+        for word in line.split():
+            word_objects.append({'text': word, 'confidence': 95.0, 'color': 'green',
+                                 'bbox': {'x': x, 'y': 40 + line_index * 20, 'width': 8 * len(word), 'height': 12}})
+            x += 8 * len(word) + 6
+    return word_objects, measurement_lines
+
+def run_llm(text, usage):
+    """Send a text through structure_text, returning the latency and the server's prompt token count"""
+    usage.clear()
+    start = time.perf_counter()
+    result = llm_processing.structure_text(text)
+    return time.perf_counter() - start, usage.get('prompt_tokens'), result
+
+# Main Entry Point
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark context selection')
+    parser.add_argument('--pages', type=int, default=50, help='Synthetic pages to generate')
+    parser.add_argument('--llm', action='store_true', help='Also call the configured LLM backends')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [make_page(rng) for _ in range(args.pages)]
+
+    full_tokens, selected_tokens, kept_values, total_values = [], [], 0, 0
+    for word_objects, measurement_lines in pages:
+        full_text = ' '.join(word['text'] for word in word_objects)
+        selected_text = select_context(word_objects)
+        full_tokens.append(estimate_tokens(full_text))
+        selected_tokens.append(estimate_tokens(selected_text))
+        total_values += len(measurement_lines)
+        kept_values += sum(1 for line in measurement_lines if line in selected_text)
+
+    print(f"{args.pages} pages, estimated tokens ({CONTEXT_CONFIG['CHARS_PER_TOKEN']} chars/token)")
+    print(f"full text:      {statistics.mean(full_tokens):.0f} tokens/page")
+    print(f"selected text:  {statistics.mean(selected_tokens):.0f} tokens/page "
+          f"({1 - sum(selected_tokens) / sum(full_tokens):.0%} fewer)")
+    print(f"measurements kept: {kept_values}/{total_values}")
+
+    if args.llm:
+        # Capture the usage reported by the server for each call
+        usage = {}
+        post = llm_processing.requests.post
+        def recording_post(*post_args, **post_kwargs):
+            response = post(*post_args, **post_kwargs)
+            if response.status_code == 200:
+                usage.update(response.json().get('usage', {}))
+            return response
+        llm_processing.requests.post = recording_post
+
+        results = {'full': [], 'selected': []}
+        for word_objects, _ in pages:
+            texts = {'full': ' '.join(word['text'] for word in word_objects), 'selected': select_context(word_objects)}
+            for mode, text in texts.items():
+                latency, prompt_tokens, result = run_llm(text, usage)
+                if result is None:
+                    raise SystemExit("LLM call failed, check LLM_CONFIG / LLM_BACKENDS")
+                results[mode].append((latency, prompt_tokens, len(result['fields'])))
+
+        for mode, rows in results.items():
+            prompt_counts = [row[1] for row in rows if row[1] is not None]
+            print(f"{mode:>8}: {statistics.mean(row[0] for row in rows):.2f} s/page, "
+                  f"{statistics.mean(prompt_counts) if prompt_counts else float('nan'):.0f} prompt tokens/page, "
+                  f"{statistics.mean(row[2] for row in rows):.1f} fields/page")
@@ -0,0 +1,93 @@
+"""
+Peak memory of processing a large PDF, streamed page by page or collected at once
+
+Generates a synthetic multi-page report, then processes it in a fresh
+subprocess per mode and reports the peak RSS of each:
+    buffered - FileHandler.process_file, then one JSON document (as /upload)
+    stream   - FileHandler.iter_file_pages, one JSON line per page (as /upload?stream=1)
+
+Usage:
+    python bench_pdf_memory.py --pages 200
+"""
+# Standard library imports
+import os
+import sys
+import json
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+
+# Third-party imports
+import fitz
+
+LABELS = ["Aorta", "Átrio esquerdo", "Septo interventricular", "Parede posterior", "FE Simpson", "Massa do VE"]
+
+def make_pdf(path, page_count, seed=0):
+    """Create a PDF whose pages look like echo reports with different values"""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(1, page_count + 1):
+        page = doc.new_page()
+        y = 72
+        page.insert_text((72, y), f"Laudo de ecocardiograma - paciente {rng.randint(10000, 99999)}", fontsize=14)
+        for _ in range(rng.randint(20, 35)):
+            y += 18
+            label = rng.choice(LABELS)
+            page.insert_text((72 + rng.randint(0, 40), y), f"{label}: {rng.uniform(5, 80):.1f} mm", fontsize=11)
+        page.insert_text((72, y + 36), f"Página {page_num}", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def get_peak_rss_mb():
+    """Return the peak RSS of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_mode(mode, pdf_path):
+    """Process the PDF in this process and print page count and peak RSS as JSON"""
+    from file_handler import FileHandler
+
+    with tempfile.TemporaryDirectory() as base_dir:
+        file_handler = FileHandler(base_dir, annotate=False)
+        file_handler.start_job()
+        baseline = get_peak_rss_mb()
+
+        if mode == 'stream':
+            page_count = 0
+            for page_result, _ in file_handler.iter_file_pages(pdf_path):
+                if page_result is not None:
+                    json.dumps(page_result, ensure_ascii=False)
+                    page_count += 1
+        else:
+            result = file_handler.process_file(pdf_path)
+            json.dumps({'success': True, 'results': [result]}, ensure_ascii=False)
+            page_count = len(result['pages'])
+
+    print(json.dumps({'mode': mode, 'pages': page_count, 'baseline_mb': baseline, 'peak_mb': get_peak_rss_mb()}))
+
+# Main Entry Point
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Peak RSS of buffered vs streamed PDF processing')
+    parser.add_argument('--pages', type=int, default=200, help='Pages in the generated PDF')
+    parser.add_argument('--mode', choices=['stream', 'buffered'], help=argparse.SUPPRESS)
+    parser.add_argument('--pdf', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.pdf)
+        raise SystemExit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, 'bench_report.pdf')
+        make_pdf(pdf_path, args.pages)
+
+        for mode in ('buffered', 'stream'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--pdf', pdf_path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>8}: {stats['pages']} pages, peak RSS {stats['peak_mb']:.0f}MB "
+                  f"({stats['peak_mb'] - stats['baseline_mb']:.0f}MB above start)")
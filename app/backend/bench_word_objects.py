@@ -0,0 +1,98 @@
+"""
+Benchmark of word object construction from Tesseract output on dense pages
+
+Compares the array-based tesseract_data_to_word_objects with the previous
+per-word loop on synthetic image_to_data output, and checks both give the
+same result.
+
+Usage:
+    python bench_word_objects.py --words 5000 --repeat 20
+"""
+# Standard library imports
+import random
+import argparse
+import timeit
+
+# Local imports
+from ocr_processing import tesseract_data_to_word_objects, create_word_object, get_word_color
+
+def make_boxes_data(word_count, seed=0):
+    """Generate synthetic Tesseract image_to_data output with empty and -1 rows"""
+    rng = random.Random(seed)
+    boxes_data = {'text': [], 'conf': [], 'left': [], 'top': [], 'width': [], 'height': []}
+
+    for i in range(word_count):
+        # Tesseract reports block/line rows with empty text and conf -1
+        is_word = rng.random() > 0.2
+        boxes_data['text'].append(f"word{i}" if is_word else rng.choice(['', ' ']))
+        boxes_data['conf'].append(round(rng.uniform(30, 99), 6) if is_word else -1)
+        boxes_data['left'].append(rng.randint(0, 3000))
+        boxes_data['top'].append(rng.randint(0, 4000))
+        boxes_data['width'].append(rng.randint(5, 200))
+        boxes_data['height'].append(rng.randint(10, 40))
+
+    return boxes_data
+
+def legacy_word_objects(boxes_data, scale_factor):
+    """Reference implementation: list of dicts, then one loop over words"""
+    words_data = [
+        {
+            'text': boxes_data['text'][i],
+            'confidence': boxes_data['conf'][i],
+            'bbox': {
+                'x': boxes_data['left'][i],
+                'y': boxes_data['top'][i],
+                'width': boxes_data['width'][i],
+                'height': boxes_data['height'][i]
+            }
+        }
+        for i in range(len(boxes_data['text']))
+    ]
+
+    word_objects = []
+    total_confidence = 0
+    word_count = 0
+    for word in words_data:
+        if not word['text'].strip() or word.get('confidence', -1) == -1:
+            continue
+        confidence = float(word['confidence'])
+        word_count += 1
+        total_confidence += confidence
+        bbox = word['bbox']
+        word_objects.append(create_word_object(
+            text=word['text'],
+            confidence=confidence,
+            bbox={
+                "x": int(bbox['x'] / scale_factor),
+                "y": int(bbox['y'] / scale_factor),
+                "width": int(bbox['width'] / scale_factor),
+                "height": int(bbox['height'] / scale_factor)
+            },
+            color=get_word_color(confidence)
+        ))
+
+    mean_confidence = total_confidence / word_count if word_count > 0 else 0.0
+    return word_objects, mean_confidence
+
+# Main Entry Point
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark word object construction')
+    parser.add_argument('--words', type=int, default=5000, help='Rows of image_to_data output per page')
+    parser.add_argument('--repeat', type=int, default=20, help='Pages processed per measurement')
+    args = parser.parse_args()
+
+    boxes_data = make_boxes_data(args.words)
+    scale_factor = 2.0
+
+    legacy_objects, legacy_mean = legacy_word_objects(boxes_data, scale_factor)
+    array_objects, array_mean = tesseract_data_to_word_objects(boxes_data, scale_factor)
+    assert legacy_objects == array_objects, "Word objects differ between implementations"
+    assert abs(legacy_mean - array_mean) < 1e-9, "Mean confidence differs between implementations"
+
+    legacy_time = min(timeit.repeat(lambda: legacy_word_objects(boxes_data, scale_factor), number=args.repeat, repeat=3))
+    array_time = min(timeit.repeat(lambda: tesseract_data_to_word_objects(boxes_data, scale_factor), number=args.repeat, repeat=3))
+
+    print(f"{args.words} rows, {len(array_objects)} words per page")
+    print(f"legacy loop:  {legacy_time / args.repeat * 1000:.2f} ms/page")
+    print(f"array-based:  {array_time / args.repeat * 1000:.2f} ms/page")
+    print(f"speedup:      {legacy_time / array_time:.2f}x")
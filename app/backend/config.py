@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -30,17 +31,93 @@ AWS_CONFIG = {
 FILE_CONFIG = {
     "ALLOWED_IMAGE_EXTENSIONS": ('.png', '.jpg', '.jpeg'),
     "ALLOWED_DOC_EXTENSIONS": ('.pdf',),
-    "MAX_FILE_SIZE": 10 * 1024 * 1024  # 10MB in bytes
+    "MAX_FILE_SIZE": 10 * 1024 * 1024,  # 10MB in bytes
+    "JOB_MEMORY_BUDGET_MB": int(os.getenv('JOB_MEMORY_BUDGET_MB', 2048)),  # Max RSS growth per upload job, 0 disables
 }
 
 # LLM Configuration
 LLM_CONFIG = {
     "API_URL": "http://localhost:11434/v1/chat/completions",
     "MODEL": "llama3.1",
+    "STRUCTURED_OUTPUT": "json_schema",  # Options: "json_schema", "json_object", "none"
+    "MAX_ATTEMPTS": 3,  # LLM calls per page before giving up on a valid JSON answer
+    "TIMEOUT": 120,  # Seconds to wait for an LLM answer
+    # OpenAI-compatible backends as JSON, e.g.
+    # [{"NAME": "fast-1", "API_URL": "http://llm-small:11434/v1/chat/completions", "MODEL": "llama3.2:3b", "TIER": "small"}]
+    # When empty, API_URL and MODEL above are used as a single "large" backend
+    "BACKENDS": json.loads(os.getenv('LLM_BACKENDS', '[]')),
+    "ROUTING": {
+        "SMALL_MAX_TOKENS": 400,  # Longer pages always go to the "large" tier
+        "MAX_NOISE_RATIO": 0.2,  # Share of garbled OCR tokens above which a page goes to "large"
+        "COOLDOWN": 30,  # Seconds a failed backend is tried last
+    },
 }
 
 # OCR Configuration
 OCR_CONFIG = {
-    "VARIANT": "tesseract",  # Options: "tesseract", "docling", "aws"
+    "VARIANT": "tesseract",  # Options: "tesseract", "docling", "aws", "adaptive"
     "CONFIDENCE_THRESHOLD": 90.0,  # Threshold for considering text as "confident"
+    "ADAPTIVE": {  # Settings for the "adaptive" variant
+        "FIRST_PASS_SCALE": 2.0,  # Upscaling of the page for the first pass (pages are rendered at 72 dpi)
+        "REOCR_SCALE": 3.0,  # Upscaling of low-confidence word crops, relative to the original page
+        "REOCR_PSM": 6,  # Tesseract page segmentation mode for the composite of crops (6 = uniform block)
+        "PADDING": 4,  # Pixels added around each word crop, in first-pass pixels
+        "TILE_GAP": 24,  # Blank pixels between crops in the composite image
+        "MAX_REGIONS": 200,  # Upper bound on word crops re-OCRed per page (all in one Tesseract call)
+    },
+}
+
+# Profiling Configuration
+PROFILING_CONFIG = {
+    "ENABLED": os.getenv('PROFILING_ENABLED', 'false').lower() == 'true',  # Sample every request, keep slow ones
+    "HEADER": "X-Profile",  # Send "X-Profile: 1" with X-Admin-Token to force a profile for one request
+    "LATENCY_THRESHOLD_MS": 5000,  # Requests slower than this are kept when ENABLED
+    "SAMPLE_INTERVAL_MS": 5,
+    "MAX_PROFILES": 50,  # Ring buffer size, oldest profiles are evicted first
+    "ADMIN_TOKEN": os.getenv('PROFILING_ADMIN_TOKEN'),  # Admin routes and forced profiles are disabled when unset
+}
+
+# Template Configuration (region-of-interest OCR for known report layouts)
+TEMPLATE_CONFIG = {
+    "ENABLED": True,
+    "FINGERPRINT_SIZE": 32,  # Side of the grayscale thumbnail used to detect a layout
+    "MATCH_THRESHOLD": 0.9,  # Minimum fingerprint correlation to reuse a template
+    "MERGE_GAP_LINES": 2,  # Label lines closer than this many line heights form one region
+    "REGION_PADDING": 0.02,  # Padding above and below regions, as a fraction of the page height
+    "MIN_LABEL_RECALL": 0.8,  # Share of the template's labels region OCR must find, else the full page is OCRed
+}
+
+# Page Deduplication Configuration (skip blank and repeated pages before OCR)
+DEDUP_CONFIG = {
+    "ENABLED": True,
+    "BLANK_INK_RATIO": 0.0001,  # Pages with a smaller share of ink pixels are blank (one line of text is ~0.0003)
+    "BLANK_INK_CONTRAST": 64,  # Gray levels below the paper color for a pixel to count as ink
+    "BLANK_MIN_SPECK_AREA": 6,  # Smaller ink blobs are dust, in pixels of a 612px wide (72 dpi) page
+    "DUPLICATE_MAX_DISTANCE": 4,  # Max dHash bit difference (of 64) for near-duplicate candidates
+    "VERIFY_CELL_SIZE": 8,  # Side of the cells the difference image is averaged over
+    "DUPLICATE_MAX_CELL_DIFF": 6,  # Max mean gray level difference of any cell for duplicates
+    "MAX_ALIGN_SHIFT": 0.05,  # Largest rescan offset aligned before comparing (fraction of the page); rotated or rescaled rescans are not deduplicated
+}
+
+# Correction Configuration (delta saves from the correction UI)
+CORRECTION_CONFIG = {
+    "COMPACT_AFTER": 20,  # Fold the per-page correction log into the page JSON after this many saves
+}
+
+# Context Selection Configuration (prompt compaction before the LLM call)
+CONTEXT_CONFIG = {
+    "ENABLED": True,
+    "WINDOW_LINES": 1,  # Lines kept above and below each label line, if they hold numbers
+    "MAX_PROMPT_TOKENS": 1500,  # Token budget for the page text in the prompt
+    "CHARS_PER_TOKEN": 4,  # Used to estimate token counts
+}
+
+# Asset Configuration (serving preprocessed and annotated page images)
+ASSET_CONFIG = {
+    "HASH_LENGTH": 12,  # Hex digits of the content hash in image filenames
+    "IMMUTABLE_MAX_AGE": 31536000,  # Cache lifetime of content-hashed images (1 year)
+    "THUMBNAIL_WIDTH": 320,
+    "THUMBNAIL_QUALITY": 80,
+    "USE_X_ACCEL": os.getenv('USE_X_ACCEL', 'false').lower() == 'true',  # Let nginx send the files, needs a filesystem shared with nginx
+    "X_ACCEL_PREFIX": "/internal",  # nginx internal locations, see frontend/default.conf
 }
@@ -0,0 +1,74 @@
+from typing import List, Dict
+from layout_analysis import group_words_into_lines, find_label_lines, contains_number, contains_measurement
+from config import CONTEXT_CONFIG
+
+GAP_MARKER = '...'
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of LLM tokens in a text"""
+    return (len(text) + CONTEXT_CONFIG["CHARS_PER_TOKEN"] - 1) // CONTEXT_CONFIG["CHARS_PER_TOKEN"]
+
+def select_context(word_objects: List[Dict]) -> str:
+    """
+    Select only the text windows around measurement labels of a page
+
+    Lines mentioning an extraction variable are kept together with
+    WINDOW_LINES lines around them when those lines contain numbers, so values
+    printed below or beside a label are not lost. Labels are matched on every
+    word of the configured variable name, so reports using other wordings
+    ("Fração de ejeção (Teichholz)") are only covered by the second pass,
+    which keeps every other line holding a measurement (a number followed by
+    a unit such as mm, ml, % or g/m²), so addresses, phone numbers, ages and
+    dates in the header are still dropped. Windows that do not fit in
+    MAX_PROMPT_TOKENS are skipped, smaller ones further down may still fit.
+    Pages without any recognized label fall back to the full text.
+
+    Args:
+        word_objects (List[Dict]): OCR word objects of the page
+
+    Returns:
+        str: Selected lines, with gaps marked by "..."
+    """
+    lines = group_words_into_lines(word_objects)
+    line_texts = [' '.join(word['text'] for word in line) for line in lines]
+    label_lines = find_label_lines(lines)
+
+    if not label_lines:
+        return ' '.join(word['text'] for word in word_objects)
+
+    window = CONTEXT_CONFIG["WINDOW_LINES"]
+    budget = CONTEXT_CONFIG["MAX_PROMPT_TOKENS"]
+    selected = set()
+    used_tokens = 0
+
+    # Label windows first, then the remaining lines holding measurements, in page order
+    windows = [
+        [index] + [
+            neighbor for neighbor in range(index - window, index + window + 1)
+            if neighbor != index and 0 <= neighbor < len(lines) and contains_number(line_texts[neighbor])
+        ]
+        for index in sorted(label_lines)
+    ]
+    windows.extend([index] for index in range(len(lines)) if contains_measurement(line_texts[index]))
+
+    for window_lines in windows:
+        new_lines = [i for i in window_lines if i not in selected]
+        cost = sum(estimate_tokens(line_texts[i]) + 1 for i in new_lines)
+        if used_tokens + cost > budget:
+            continue
+        selected.update(new_lines)
+        used_tokens += cost
+
+    if not selected:
+        return ' '.join(word['text'] for word in word_objects)
+
+    # Rebuild the text in page order, marking skipped lines
+    output = []
+    previous = None
+    for index in sorted(selected):
+        if previous is not None and index != previous + 1:
+            output.append(GAP_MARKER)
+        output.append(line_texts[index])
+        previous = index
+
+    return '\n'.join(output)
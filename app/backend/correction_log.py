@@ -0,0 +1,151 @@
+import os
+import json
+from typing import List, Dict
+from config import CORRECTION_CONFIG
+
+LOG_SUFFIX = '.log'
+
+def get_corrected_json_name(filename: str, page: int) -> str:
+    """
+    Get the corrected OCR JSON filename of a page
+
+    Args:
+        filename (str): Uploaded filename
+        page (int): Page number (1-based)
+
+    Returns:
+        str: Filename in the confirmed OCR directory
+    """
+    base_name = os.path.splitext(filename)[0]
+    if page > 1:
+        return f"{base_name}_page_{page}_ocr_corrected.json"
+    return f"{base_name}_ocr_corrected.json"
+
+def get_processed_json_path(processed_dir: str, filename: str, page: int) -> str:
+    """Find the step 3 OCR JSON of a page, for images and PDF pages alike"""
+    base_name = os.path.splitext(filename)[0]
+    candidates = [f"{base_name}_page_{page}_ocr.json"]
+    if page == 1:
+        candidates.append(f"{base_name}_ocr.json")
+
+    for candidate in candidates:
+        path = os.path.join(processed_dir, candidate)
+        if os.path.exists(path):
+            return path
+
+    raise FileNotFoundError(f"No OCR result found for {filename} page {page}")
+
+def get_log_path(json_path: str) -> str:
+    """Get the correction log path next to a corrected JSON file"""
+    return json_path + LOG_SUFFIX
+
+def apply_changes(word_objects: List[Dict], changes: List[Dict]):
+    """
+    Apply word changes in place
+
+    Args:
+        word_objects (List[Dict]): Word objects of the page
+        changes (List[Dict]): Changes, each with the word "index" and the updated fields
+    """
+    for change in changes:
+        index = change['index']
+        if not 0 <= index < len(word_objects):
+            print(f"Skipping correction for out of range word index {index}")
+            continue
+        word_objects[index].update({key: value for key, value in change.items() if key != 'index'})
+
+def load_corrected_page(json_path: str) -> Dict:
+    """
+    Load a corrected page with all pending logged changes applied
+
+    Args:
+        json_path (str): Path to the corrected JSON file
+
+    Returns:
+        Dict: Page data
+    """
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    log_path = get_log_path(json_path)
+    if os.path.exists(log_path):
+        with open(log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    apply_changes(data['word_objects'], json.loads(line)['changes'])
+
+    return data
+
+def compact(json_path: str):
+    """Fold the correction log into the corrected JSON file and remove the log"""
+    data = load_corrected_page(json_path)
+
+    # Write to a temporary file first so a crash never leaves a truncated page
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+
+    os.unlink(get_log_path(json_path))
+
+def validate_changes(changes) -> List[Dict]:
+    """
+    Check the shape of a list of word changes
+
+    Raises:
+        ValueError: If changes is not a list of dicts with a non-negative integer "index"
+    """
+    if not isinstance(changes, list):
+        raise ValueError("changes must be a list")
+    for change in changes:
+        if not isinstance(change, dict) or not isinstance(change.get('index'), int) or change['index'] < 0:
+            raise ValueError("Each change needs a non-negative integer 'index'")
+    return changes
+
+def append_changes(confirmed_dir: str, processed_dir: str, filename: str, page: int, changes: List[Dict]) -> Dict:
+    """
+    Append word changes to the correction log of a page
+
+    The first save of a page creates the corrected JSON from the OCR result;
+    later saves only append one line to the log, which is compacted into the
+    JSON once it holds COMPACT_AFTER entries.
+
+    Args:
+        confirmed_dir (str): Confirmed OCR directory (step 3.5)
+        processed_dir (str): OCR result directory (step 3)
+        filename (str): Uploaded filename
+        page (int): Page number (1-based)
+        changes (List[Dict]): Changes, each with the word "index" and the updated fields
+
+    Returns:
+        Dict: json_path, whether the page was created or compacted, and pending log entries
+    """
+    json_path = os.path.join(confirmed_dir, get_corrected_json_name(filename, page))
+    log_path = get_log_path(json_path)
+
+    if not os.path.exists(json_path):
+        with open(get_processed_json_path(processed_dir, filename, page), 'r', encoding='utf-8') as f:
+            ocr_data = json.load(f)
+
+        apply_changes(ocr_data['word_objects'], changes)
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'filename': filename,
+                'page': page,
+                'word_objects': ocr_data['word_objects']
+            }, f, ensure_ascii=False)
+
+        return {'json_path': json_path, 'created': True, 'compacted': False, 'pending': 0}
+
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'changes': changes}, ensure_ascii=False) + '\n')
+
+    with open(log_path, 'r', encoding='utf-8') as f:
+        pending = sum(1 for line in f if line.strip())
+
+    compacted = pending >= CORRECTION_CONFIG["COMPACT_AFTER"]
+    if compacted:
+        compact(json_path)
+        pending = 0
+
+    return {'json_path': json_path, 'created': False, 'compacted': compacted, 'pending': pending}
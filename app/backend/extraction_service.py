@@ -1,8 +1,18 @@
-from flask import current_app as app, request, Blueprint, jsonify, send_from_directory
+from flask import current_app as app, request, Blueprint, jsonify, send_from_directory, send_file, Response, stream_with_context
 import os
+import io
+import csv
 import json
+import hashlib
+import tempfile
 from datetime import datetime
-from llm_processing import structure_text
+from result_store import ResultStore, RESULT_COLUMNS
+from llm_processing import structure_text, get_model_signature, router
+from correction_log import load_corrected_page
+from context_selection import select_context, estimate_tokens
+from config import CONTEXT_CONFIG
+
+MANIFEST_FILENAME = 'extraction_manifest.json'
 
 # Create the Blueprint for all extraction routes
 blueprint = Blueprint('extraction', __name__, url_prefix='/extraction')
@@ -12,16 +22,105 @@ def get_timestamp():
     """Generate a timestamp in the format YYYYMMDD_HHMMSS"""
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
+def get_run_id(store, directory):
+    """
+    Generate a timestamp identifying an extraction run
+
+    Runs finishing within the same second get a numeric suffix
+    (YYYYMMDD_HHMMSS_2), so their rows and result files never merge.
+    """
+    timestamp = get_timestamp()
+    run_id = timestamp
+    suffix = 2
+    while store.has_run(run_id) or os.path.exists(os.path.join(directory, f'structured_data_{run_id}.json')):
+        run_id = f"{timestamp}_{suffix}"
+        suffix += 1
+    return run_id
+
 def save_csv_file(csv_data, directory, timestamp):
-    """Save CSV data to file and return the filepath"""
+    """Save structured fields as a CSV file and return the filename"""
     filename = f"structured_{timestamp}.csv"
     filepath = os.path.join(directory, filename)
     
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(csv_data)
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'value'])
+        for field in csv_data.get('fields', []):
+            writer.writerow([field['name'], field['value']])
         
     return filename
 
+def get_result_store():
+    """Return the result store of the app, opening it on first use"""
+    if 'result_store' not in app.extensions:
+        app.extensions['result_store'] = ResultStore(app.config['RESULT_DB'])
+    return app.extensions['result_store']
+
+def stream_csv(store, run_id=None):
+    """Yield stored results as CSV text, one batch of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RESULT_COLUMNS)
+    
+    for batch in store.iter_batches(run_id):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    yield buffer.getvalue()
+
+def export_parquet(store, run_id=None):
+    """Write stored results to a temporary Parquet file, batch by batch (requires pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+    
+    schema = pa.schema([
+        ('run_id', pa.string()),
+        ('created_at', pa.string()),
+        ('document', pa.string()),
+        ('page', pa.int32()),
+        ('variable', pa.string()),
+        ('value', pa.string()),
+        ('source', pa.string())
+    ])
+    
+    temp_fd, temp_path = tempfile.mkstemp(suffix='.parquet')
+    os.close(temp_fd)
+    with pq.ParquetWriter(temp_path, schema) as writer:
+        for batch in store.iter_batches(run_id):
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+    return temp_path
+
+def export_response(run_id=None, export_format='csv'):
+    """Build a download response for stored results of one run or the whole history"""
+    store = get_result_store()
+    name = f"structured_{run_id}" if run_id else "structured_history"
+    
+    if export_format == 'parquet':
+        temp_path = export_parquet(store, run_id)
+        response = send_file(
+            temp_path,
+            as_attachment=True,
+            download_name=f"{name}.parquet",
+            mimetype='application/vnd.apache.parquet'
+        )
+        response.call_on_close(lambda: os.unlink(temp_path))
+        return response
+    
+    return Response(
+        stream_with_context(stream_csv(store, run_id)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={name}.csv'}
+    )
+
 def ensure_directory_exists(directory_path):
     """Create directory if it doesn't exist"""
     if not os.path.exists(directory_path):
@@ -30,26 +129,66 @@ def ensure_directory_exists(directory_path):
     return True
 
 def load_ocr_data(file_path):
-    """Load OCR data from a JSON file"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Load OCR data from a JSON file, including corrections still in its log"""
+    return load_corrected_page(file_path)
 
 def extract_text_from_ocr(ocr_data):
-    """Extract plain text from OCR data word objects"""
+    """Extract the text sent to the LLM from OCR data word objects"""
     if 'word_objects' in ocr_data:
+        if CONTEXT_CONFIG["ENABLED"]:
+            return select_context(ocr_data['word_objects'])
         return ' '.join([word['text'] for word in ocr_data['word_objects']])
     return ""
 
+def compute_text_hash(text):
+    """Hash the text sent to the LLM, together with the models that may process it"""
+    return hashlib.sha256(f"{get_model_signature()}\n{text}".encode('utf-8')).hexdigest()
+
+def load_manifest(directory):
+    """Load per-page text hashes and structured results of previous runs"""
+    manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error loading extraction manifest: {str(e)}")
+        return {}
+
+def save_manifest(directory, manifest):
+    """Save per-page text hashes and structured results"""
+    with open(os.path.join(directory, MANIFEST_FILENAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
 def process_single_document(file_path, filename):
     """Process a single OCR document and return structured data"""
     try:
         ocr_data = load_ocr_data(file_path)
-        text = extract_text_from_ocr(ocr_data)
-        
+        return structure_document(ocr_data, extract_text_from_ocr(ocr_data), filename)
+    except Exception as e:
+        print(f"Error processing {filename}: {str(e)}")
+        return None
+
+def get_document_origin(ocr_data, filename):
+    """
+    Return the uploaded filename and page number of an OCR JSON file
+
+    OCR and confirmed JSON files record both; files saved before they did
+    fall back to the JSON filename and page 1.
+    """
+    return ocr_data.get('filename', filename), ocr_data.get('page', 1)
+
+def structure_document(ocr_data, text, filename):
+    """Send the text of an OCR document to the LLM and return structured data"""
+    try:
         if not text:
             return None
             
         structured_data = structure_text(text)
+        if structured_data is None:
+            return None
+        document, page = get_document_origin(ocr_data, filename)
         
         # Add source information to each field
         fields_with_source = []
@@ -61,8 +200,8 @@ def process_single_document(file_path, filename):
             })
         
         return {
-            "filename": filename,
-            "page": ocr_data.get('page', 1),
+            "filename": document,
+            "page": page,
             "fields": fields_with_source
         }
     except Exception as e:
@@ -87,6 +226,11 @@ def extraction():
         
         # Process with LLM
         csv_data = structure_text(data['text'])
+        if csv_data is None:
+            return jsonify({
+                'success': False,
+                'error': 'LLM extraction failed'
+            }), 500
         
         # Save to file
         csv_filename = save_csv_file(csv_data, app.config['STEP_6_DIR'], timestamp)
@@ -105,9 +249,12 @@ def extraction():
 
 @blueprint.route('/download/<timestamp>', methods=['GET'])
 def download_csv(timestamp):
-    """Download a previously generated CSV file by timestamp"""
+    """Download a previously generated CSV file by timestamp, or a stored run's results"""
     try:
         filename = f"structured_{timestamp}.csv"
+        if not os.path.exists(os.path.join(app.config['STEP_6_DIR'], filename)) and get_result_store().has_run(timestamp):
+            return export_response(timestamp)
+        
         return send_from_directory(
             app.config['STEP_6_DIR'],
             filename,
@@ -120,6 +267,52 @@ def download_csv(timestamp):
             'error': str(e)
         }), 500
 
+@blueprint.route('/export', methods=['GET'])
+def export_results():
+    """
+    Stream stored extraction results as CSV or Parquet
+    
+    Query parameters:
+        run: Only export this run (the process-all timestamp); all runs when omitted
+        format: "csv" (default) or "parquet"
+    """
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'parquet'):
+            return jsonify({
+                'success': False,
+                'error': f'Unknown export format: {export_format}'
+            }), 400
+        
+        return export_response(request.args.get('run'), export_format)
+        
+    except ImportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@blueprint.route('/runs', methods=['GET'])
+def list_runs():
+    """List extraction runs held in the result store"""
+    return jsonify({
+        'success': True,
+        'runs': get_result_store().list_runs()
+    })
+
+@blueprint.route('/backends', methods=['GET'])
+def get_backends():
+    """Report load and health of the configured LLM backends"""
+    return jsonify({
+        'success': True,
+        'backends': router.get_status()
+    })
+
 @blueprint.route('/process-all', methods=['POST'])
 def process_all_documents():
     """Process all OCR documents in the confirmed OCR directory"""
@@ -138,6 +331,14 @@ def process_all_documents():
         # Initialize result
         result_data = {"documents": []}
         
+        # Results of previous runs, reused for pages whose text did not change
+        step_6_dir = app.config['STEP_6_DIR']
+        ensure_directory_exists(step_6_dir)
+        previous_manifest = load_manifest(step_6_dir)
+        manifest = {}
+        reused_count = 0
+        prompt_tokens = {'full': 0, 'selected': 0}
+        
         # Get list of files
         files = os.listdir(confirmed_ocr_dir)
         
@@ -151,10 +352,31 @@ def process_all_documents():
         for filename in files:
             if filename.endswith('.json'):
                 file_path = os.path.join(confirmed_ocr_dir, filename)
-                document_data = process_single_document(file_path, filename)
+                
+                try:
+                    ocr_data = load_ocr_data(file_path)
+                except Exception as e:
+                    print(f"Error loading {filename}: {str(e)}")
+                    continue
+                
+                text = extract_text_from_ocr(ocr_data)
+                prompt_tokens['full'] += estimate_tokens(' '.join(w['text'] for w in ocr_data.get('word_objects', [])))
+                prompt_tokens['selected'] += estimate_tokens(text)
+                text_hash = compute_text_hash(text)
+                previous = previous_manifest.get(filename)
+                
+                if previous and previous['text_hash'] == text_hash:
+                    document, page = get_document_origin(ocr_data, filename)
+                    document_data = dict(previous['result'], filename=document, page=page)
+                    reused_count += 1
+                else:
+                    document_data = structure_document(ocr_data, text, filename)
                 
                 if document_data:
                     result_data['documents'].append(document_data)
+                    
+                    # Failed LLM calls return None and are retried next run
+                    manifest[filename] = {'text_hash': text_hash, 'result': document_data}
         
         # Check if any documents were processed
         if not result_data['documents']:
@@ -164,18 +386,25 @@ def process_all_documents():
             }), 500
         
         # Save results
-        step_6_dir = app.config['STEP_6_DIR']
-        ensure_directory_exists(step_6_dir)
+        save_manifest(step_6_dir, manifest)
         
-        timestamp = get_timestamp()
+        store = get_result_store()
+        timestamp = get_run_id(store, step_6_dir)
         output_path = os.path.join(step_6_dir, f'structured_data_{timestamp}.json')
         
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(result_data, f, ensure_ascii=False, indent=2)
+        
+        # Append this run's fields to the result store
+        store.append_run(timestamp, result_data['documents'])
             
         return jsonify({
             'success': True,
-            'data': result_data
+            'data': result_data,
+            'timestamp': timestamp,
+            'processed': len(result_data['documents']) - reused_count,
+            'reused': reused_count,
+            'estimated_prompt_tokens': prompt_tokens
         })
         
     except Exception as e:
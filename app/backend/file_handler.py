@@ -1,26 +1,53 @@
 import os
+import sys
 import cv2
+import glob
 import fitz
+import hashlib
 import numpy as np
-from PIL import Image
-from typing import List, Dict
-from ocr_processing import perform_ocr_processing
+import resource
+from typing import List, Dict, Iterator
+from ocr_processing import perform_ocr_processing, save_annotated_image
+from page_dedup import is_blank_page, compute_dhash, hamming_distance, pages_match
+from template_store import TemplateStore
 import json
-from config import FILE_CONFIG
+from config import FILE_CONFIG, TEMPLATE_CONFIG, DEDUP_CONFIG, ASSET_CONFIG
+
+def get_rss_mb() -> float:
+    """Return the current resident set size of the process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        # Not on Linux: fall back to the peak RSS (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
 
 class FileHandler:
-    def __init__(self, base_dir: str):
+    def __init__(self, base_dir: str, annotate: bool = True):
         """
         Initialize FileHandler with base directory and create workflow directories
         
         Args:
             base_dir (str): Base directory for all workflow folders
+            annotate (bool): Save annotated page images for the correction UI
         """
+        self.annotate = annotate
+        
         # Set up all directory paths
         self.setup_directories(base_dir)
         
         # Create all needed directories
         self.create_workflow_directories()
+        
+        # Learned report layouts for region-of-interest OCR
+        self.template_store = TemplateStore(self.templates_dir)
+        
+        # Pages OCR'd in the current job: (hash, source, json_path, preprocessed_path)
+        self.page_hashes = []
+        
+        # Process RSS at the start of the current job, see start_job
+        self.job_rss_baseline = None
 
     def setup_directories(self, base_dir: str):
         """Define all directory paths used in the workflow"""
@@ -34,6 +61,12 @@ class FileHandler:
         self.confirmed_ocr_dir = os.path.join(self.workflow_dir, 'step_3_5_with_confirmed_ocr_files')
         self.structured_dir = os.path.join(self.workflow_dir, 'step_6_with_llm_structured_data')
         
+        # Downscaled WebP copies of preprocessed images
+        self.thumbnails_dir = os.path.join(self.workflow_dir, 'thumbnails')
+        
+        # Learned report templates (kept across cleanups)
+        self.templates_dir = os.path.join(self.workflow_dir, 'templates')
+        
         # Frontend resources directory
         self.static_resources_dir = os.path.join(base_dir, '..', 'frontend', 'static', 'ressources')
 
@@ -46,6 +79,8 @@ class FileHandler:
             self.processed_dir,
             self.confirmed_ocr_dir,
             self.structured_dir,
+            self.thumbnails_dir,
+            self.templates_dir,
             self.static_resources_dir
         ]
         
@@ -81,7 +116,11 @@ class FileHandler:
     # File Saving Functions
     def save_preprocessed_image(self, image: np.ndarray, filename: str) -> str:
         """
-        Save preprocessed image to step 2 directory
+        Save preprocessed image to step 2 directory under a content-hashed name
+        
+        The hash of the encoded image is inserted before the extension
+        (preprocessed_x.jpg -> preprocessed_x.<hash>.jpg), so the file can be
+        cached by browsers forever: changed content always gets a new URL.
         
         Args:
             image (np.ndarray): Image as numpy array
@@ -90,10 +129,39 @@ class FileHandler:
         Returns:
             str: Path where image was saved
         """
-        save_path = os.path.join(self.preprocessed_dir, filename)
-        cv2.imwrite(save_path, image)
+        stem, ext = os.path.splitext(filename)
+        _, encoded = cv2.imencode(ext or '.jpg', image)
+        content_hash = hashlib.sha256(encoded.tobytes()).hexdigest()[:ASSET_CONFIG["HASH_LENGTH"]]
+        
+        save_path = os.path.join(self.preprocessed_dir, f"{stem}.{content_hash}{ext}")
+        with open(save_path, 'wb') as f:
+            f.write(encoded.tobytes())
         return save_path
 
+    def save_thumbnail(self, filename: str) -> str:
+        """
+        Create a downscaled WebP thumbnail of a preprocessed image, once
+        
+        Args:
+            filename (str): Filename in the preprocessed directory
+            
+        Returns:
+            str: Thumbnail filename in the thumbnails directory, or None if the image is missing
+        """
+        thumbnail_name = f"{os.path.splitext(filename)[0]}.webp"
+        thumbnail_path = os.path.join(self.thumbnails_dir, thumbnail_name)
+        if os.path.exists(thumbnail_path):
+            return thumbnail_name
+        
+        img = cv2.imread(os.path.join(self.preprocessed_dir, filename))
+        if img is None:
+            return None
+        
+        scale = min(1.0, ASSET_CONFIG["THUMBNAIL_WIDTH"] / img.shape[1])
+        thumbnail = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        cv2.imwrite(thumbnail_path, thumbnail, [cv2.IMWRITE_WEBP_QUALITY, ASSET_CONFIG["THUMBNAIL_QUALITY"]])
+        return thumbnail_name
+
     def save_processed_result(self, text: str, filename: str, json_data: dict = None) -> tuple:
         """
         Save OCR result to step 3 directory - both text and JSON format
@@ -123,13 +191,15 @@ class FileHandler:
         return text_path, json_path
 
     # Image Processing Functions
-    def process_image(self, img: np.ndarray, filename: str) -> Dict:
+    def process_image(self, img: np.ndarray, filename: str, document: str = None, page: int = 1) -> Dict:
         """
         Process a single image through OCR
         
         Args:
             img (np.ndarray): Image as numpy array
             filename (str): Original filename
+            document (str): Uploaded filename the page belongs to, defaults to filename
+            page (int): Page number in the uploaded file (1-based)
             
         Returns:
             Dict: Processing results with paths and OCR data
@@ -141,13 +211,15 @@ class FileHandler:
         )
         
         # Step 3: Perform OCR
-        ocr_result = perform_ocr_processing(img, filename)
+        ocr_result, template_id = self.perform_template_ocr(img, filename)
         
         # Save OCR results
         processed_path, json_path = self.save_processed_result(
             ocr_result['text'], 
             filename,
             json_data={
+                'filename': document or filename,
+                'page': page,
                 'text': ocr_result['text'],
                 'word_objects': ocr_result['word_objects'],
                 'mean_confidence': ocr_result['mean_confidence']
@@ -156,64 +228,236 @@ class FileHandler:
         
         # Return page information
         return {
-            'page': 1,
+            'page': page,
             'text': ocr_result['text'],
             'word_objects': ocr_result['word_objects'],
             'mean_confidence': ocr_result['mean_confidence'],
+            'template': template_id,
             'preprocessed_path': preprocessed_path,
+            'annotated_image': ocr_result['annotated_image'],
             'processed_path': processed_path,
             'json_path': json_path
         }
 
-    def process_pdf(self, filepath: str, filename: str) -> List[Dict]:
+    def perform_template_ocr(self, img: np.ndarray, filename: str) -> tuple:
         """
-        Process a PDF file, extracting and processing each page
+        OCR only the regions of a known report layout, falling back to the full page
         
         Args:
-            filepath (str): Path to the PDF file
-            filename (str): Original filename
+            img (np.ndarray): Image as numpy array
+            filename (str): Name to save the annotated image under
             
         Returns:
-            List[Dict]: List of page results
+            tuple: (ocr_result, template_id), template_id is None for full-page OCR
         """
-        pages = []
+        template = self.template_store.match(img) if TEMPLATE_CONFIG["ENABLED"] else None
         
-        # Open PDF document
-        doc = fitz.open(filepath)
+        if template is not None:
+            regions = self.template_store.get_pixel_regions(template, img.shape)
+            ocr_result = perform_ocr_processing(img, filename if self.annotate else None, regions=regions)
+            
+            # Only trust the template if most of its measurement labels were found again
+            if self.template_store.recovers_labels(template, ocr_result['word_objects']):
+                return ocr_result, template['id']
+        
+        return perform_ocr_processing(img, filename if self.annotate else None), None
+
+    def find_page_image(self, filename: str, page: int) -> str:
+        """
+        Find the preprocessed image of a page of an uploaded file
+        
+        Args:
+            filename (str): Uploaded filename
+            page (int): Page number (1-based)
+            
+        Returns:
+            str: Path in the preprocessed directory, or None if not found
+        """
+        if self.handle_file_type(filename) == 'pdf':
+            stem, ext = f"preprocessed_{os.path.splitext(filename)[0]}_page_{page}", '.jpg'
+        else:
+            stem, ext = os.path.splitext(f"preprocessed_{filename}")
         
-        # Process each page
-        for page_num, page in enumerate(doc, 1):
-            # Create a filename for this page
-            page_filename = f"{os.path.splitext(filename)[0]}_page_{page_num}.jpg"
+        # Preprocessed images carry a content hash before the extension
+        matches = glob.glob(os.path.join(self.preprocessed_dir, f"{glob.escape(stem)}.*{ext}"))
+        return max(matches, key=os.path.getmtime) if matches else None
+
+    def learn_template(self, filename: str, page: int, word_objects: List[Dict]):
+        """
+        Learn the report layout of a page from its confirmed word objects
+        
+        Args:
+            filename (str): Uploaded filename
+            page (int): Page number (1-based)
+            word_objects (List[Dict]): Confirmed OCR word objects
             
-            # Convert PDF page to image
-            pix = page.get_pixmap()
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            img_array = np.array(img)[:, :, ::-1]  # Convert RGB to BGR
+        Returns:
+            Optional[Dict]: The learned template, or None if nothing was learned
+        """
+        if not TEMPLATE_CONFIG["ENABLED"]:
+            return None
+        
+        image_path = self.find_page_image(filename, page)
+        img = cv2.imread(image_path) if image_path else None
+        if img is None:
+            return None
+        
+        return self.template_store.learn(img, word_objects, f"{filename}#{page}")
+
+    def process_page(self, img: np.ndarray, filename: str, document: str, page: int = 1) -> tuple:
+        """
+        Process a page unless it is blank or a near-duplicate of a page already processed
+        
+        Args:
+            img (np.ndarray): Image as numpy array
+            filename (str): Page filename
+            document (str): Uploaded filename the page belongs to
+            page (int): Page number in the uploaded file (1-based)
             
-            # Process the page image
-            page_result = self.process_image(img_array, page_filename)
+        Returns:
+            tuple: (page_result, skipped), page_result is None for blank pages and
+                   skipped is None for pages that went through OCR
+        """
+        if not DEDUP_CONFIG["ENABLED"]:
+            return self.process_image(img, filename, document, page), None
+        
+        # Human-readable page reference, e.g. "report.pdf#2"
+        source = f"{document}#{page}" if self.handle_file_type(document) == 'pdf' else document
+        
+        if is_blank_page(img):
+            return None, {'source': source, 'reason': 'blank'}
+        
+        page_hash = compute_dhash(img)
+        for known_hash, known_source, json_path, image_path in self.page_hashes:
+            if not json_path or hamming_distance(page_hash, known_hash) > DEDUP_CONFIG["DUPLICATE_MAX_DISTANCE"]:
+                continue
+            
+            # The hash only preselects candidates, compare with the saved page image
+            known_img = cv2.imread(image_path)
+            if known_img is not None and pages_match(img, known_img):
+                page_result = self.reuse_page_result(img, filename, json_path, document, page)
+                return page_result, {'source': source, 'reason': 'duplicate', 'duplicate_of': known_source}
+        
+        page_result = self.process_image(img, filename, document, page)
+        self.page_hashes.append((page_hash, source, page_result['json_path'], page_result['preprocessed_path']))
+        return page_result, None
+
+    def reuse_page_result(self, img: np.ndarray, filename: str, json_path: str, document: str, page: int) -> Dict:
+        """
+        Build a page result from the saved OCR result of a duplicate page
+        
+        Args:
+            img (np.ndarray): Image as numpy array
+            filename (str): Page filename
+            json_path (str): OCR JSON of the page being duplicated
+            document (str): Uploaded filename the page belongs to
+            page (int): Page number in the uploaded file (1-based)
             
-            # Add page number to result
-            page_result['page'] = page_num
+        Returns:
+            Dict: Page result with the same structure as process_image
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            ocr_result = json.load(f)
+        ocr_result.update({'filename': document, 'page': page})
+        
+        preprocessed_path = self.save_preprocessed_image(img, f"preprocessed_{filename}")
+        annotated_image = None
+        if self.annotate and ocr_result['word_objects']:
+            annotated_image = save_annotated_image(img, ocr_result['word_objects'], filename)
+        
+        processed_path, new_json_path = self.save_processed_result(
+            ocr_result['text'],
+            filename,
+            json_data=ocr_result
+        )
+        
+        return {
+            'page': page,
+            'text': ocr_result['text'],
+            'word_objects': ocr_result['word_objects'],
+            'mean_confidence': ocr_result['mean_confidence'],
+            'template': None,
+            'preprocessed_path': preprocessed_path,
+            'annotated_image': annotated_image,
+            'processed_path': processed_path,
+            'json_path': new_json_path
+        }
+
+    def iter_pdf_pages(self, filepath: str, filename: str) -> Iterator[tuple]:
+        """
+        Process a PDF file page by page, yielding each result as soon as it is ready
+        
+        Each page image is released right after OCR, so only one page is held in
+        memory at a time.
+        
+        Args:
+            filepath (str): Path to the PDF file
+            filename (str): Original filename
             
-            pages.append(page_result)
+        Yields:
+            tuple: (page_result, skipped) as returned by process_page, with page numbers set
+        """
+        # Open PDF document
+        doc = fitz.open(filepath)
+        
+        try:
+            # Process each page
+            for page_num, page in enumerate(doc, 1):
+                self.check_memory_budget()
+                
+                # Create a filename for this page
+                page_filename = f"{os.path.splitext(filename)[0]}_page_{page_num}.jpg"
+                
+                # Convert PDF page to a BGR image without intermediate copies
+                pix = page.get_pixmap()
+                samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+                img_array = np.ascontiguousarray(samples[:, :, 2::-1])
+                del samples, pix
+                
+                # Process the page image, then drop it
+                page_result, skipped = self.process_page(img_array, page_filename, filename, page_num)
+                del img_array
+                
+                if skipped:
+                    skipped['page'] = page_num
+                
+                yield page_result, skipped
+        finally:
+            # Close the PDF
+            doc.close()
+
+    def process_pdf(self, filepath: str, filename: str) -> tuple:
+        """
+        Process a PDF file, extracting and processing each page
+        
+        Args:
+            filepath (str): Path to the PDF file
+            filename (str): Original filename
             
-        # Close the PDF
-        doc.close()
+        Returns:
+            tuple: (pages, skipped_pages)
+        """
+        pages = []
+        skipped_pages = []
+        
+        for page_result, skipped in self.iter_pdf_pages(filepath, filename):
+            if skipped:
+                skipped_pages.append(skipped)
+            if page_result is not None:
+                pages.append(page_result)
         
-        return pages
+        return pages, skipped_pages
 
     # Main Processing Functions
-    def process_file(self, filepath: str) -> Dict:
+    def iter_file_pages(self, filepath: str) -> Iterator[tuple]:
         """
-        Process file through all workflow steps
+        Process file through all workflow steps, yielding page results as they complete
         
         Args:
             filepath (str): Path to the file to process
             
-        Returns:
-            Dict: Processing results with all page data
+        Yields:
+            tuple: (page_result, skipped), either may be None
         """
         # Get the filename and determine file type
         filename = os.path.basename(filepath)
@@ -223,29 +467,71 @@ class FileHandler:
         self.check_file_size(filepath, filename)
         
         try:
-            pages = []
-            
             # Process based on file type
             if file_type == 'image':
                 # Load and process single image
+                self.check_memory_budget()
                 img = cv2.imread(filepath)
                 if img is not None:
-                    page_result = self.process_image(img, filename)
-                    pages.append(page_result)
+                    page_result, skipped = self.process_page(img, filename, filename)
+                    del img
+                    if skipped:
+                        skipped['page'] = 1
+                    yield page_result, skipped
                     
             elif file_type == 'pdf':
                 # Process multi-page PDF
-                pages = self.process_pdf(filepath, filename)
-
-            # Return complete file processing results
-            return {
-                'filename': filename,
-                'pages': pages
-            }
+                yield from self.iter_pdf_pages(filepath, filename)
 
         except Exception as e:
             raise RuntimeError(f"Error processing file {filename}: {str(e)}")
 
+    def process_file(self, filepath: str) -> Dict:
+        """
+        Process file through all workflow steps
+        
+        Args:
+            filepath (str): Path to the file to process
+            
+        Returns:
+            Dict: Processing results with all page data
+        """
+        pages = []
+        skipped_pages = []
+        
+        for page_result, skipped in self.iter_file_pages(filepath):
+            if skipped:
+                skipped_pages.append(skipped)
+            if page_result is not None:
+                pages.append(page_result)
+        
+        # Return complete file processing results
+        return {
+            'filename': os.path.basename(filepath),
+            'pages': pages,
+            'skipped_pages': skipped_pages
+        }
+
+    # Memory Budget Functions
+    def start_job(self):
+        """Record the memory in use at the start of a job, as the base of its budget"""
+        self.job_rss_baseline = get_rss_mb()
+
+    def check_memory_budget(self):
+        """
+        Check the memory used by the current job against the configured budget
+        
+        Raises:
+            RuntimeError: If the job grew the process RSS beyond JOB_MEMORY_BUDGET_MB
+        """
+        budget = FILE_CONFIG["JOB_MEMORY_BUDGET_MB"]
+        if not budget or self.job_rss_baseline is None:
+            return
+        
+        used = get_rss_mb() - self.job_rss_baseline
+        if used > budget:
+            raise RuntimeError(f"Job exceeded memory budget: {used:.0f}MB used of {budget}MB")
+
     def check_file_size(self, filepath: str, filename: str):
         """
         Check if file size is within allowed limits
@@ -286,9 +572,13 @@ class FileHandler:
             self.processed_dir,           # step_3_with_ocr_proccessed_files
             self.confirmed_ocr_dir,       # step_3.5_with_confirmed_ocr_files
             self.structured_dir,          # step_6_with_llm_structured_data
+            self.thumbnails_dir,          # thumbnails of step 2 images
             self.static_resources_dir     # frontend/static/ressources
         ]
         
         # Clean each directory
         for directory in directories:
-            self.cleanup_directory(directory)
\ No newline at end of file
+            self.cleanup_directory(directory)
+        
+        # Forget pages of the previous job
+        self.page_hashes = []
\ No newline at end of file
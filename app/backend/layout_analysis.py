@@ -0,0 +1,90 @@
+import re
+import unicodedata
+from typing import List, Dict
+from config import EXTRACTION_VARIABLES
+
+NUMBER_PATTERN = re.compile(r'\d+(?:[.,]\d+)?')
+MEASUREMENT_PATTERN = re.compile(
+    r'\d+(?:[.,]\d+)?\s*(?:%|(?:mm\s*hg|mm|cm|ml|g|m|s|bpm)(?:\s*/\s*(?:m[²2]|s|min))?(?:[²2³3])?)(?![^\W\d_])',
+    re.IGNORECASE
+)
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and strip accents and punctuation for fuzzy label matching"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9 ]', ' ', without_accents).strip()
+
+def get_label_tokens() -> Dict[str, List[str]]:
+    """Return the normalized tokens of each extraction variable"""
+    return {variable: normalize_text(variable).split() for variable in EXTRACTION_VARIABLES}
+
+def contains_number(text: str) -> bool:
+    """Check whether a word contains a numeric value"""
+    return NUMBER_PATTERN.search(text) is not None
+
+def contains_measurement(text: str) -> bool:
+    """Check whether a text contains a number followed by a measurement unit (mm, ml, %, g/m², ...)"""
+    return MEASUREMENT_PATTERN.search(text) is not None
+
+def group_words_into_lines(word_objects: List[Dict]) -> List[List[Dict]]:
+    """
+    Group word objects into text lines using their bounding boxes
+
+    Words whose vertical centers are within half a median word height of the
+    current line are placed on it; each line is sorted left to right.
+
+    Args:
+        word_objects (List[Dict]): OCR word objects with bbox
+
+    Returns:
+        List[List[Dict]]: Lines of word objects, top to bottom
+    """
+    if not word_objects:
+        return []
+
+    heights = sorted(word['bbox']['height'] for word in word_objects)
+    tolerance = max(heights[len(heights) // 2] / 2, 1)
+
+    lines = []
+    line_center = None
+    for word in sorted(word_objects, key=lambda w: w['bbox']['y'] + w['bbox']['height'] / 2):
+        center = word['bbox']['y'] + word['bbox']['height'] / 2
+        if line_center is None or center - line_center > tolerance:
+            lines.append([])
+            line_center = center
+        lines[-1].append(word)
+
+    return [sorted(line, key=lambda w: w['bbox']['x']) for line in lines]
+
+def find_label_lines(lines: List[List[Dict]]) -> Dict[int, List[str]]:
+    """
+    Find lines that mention extraction variables
+
+    Args:
+        lines (List[List[Dict]]): Lines from group_words_into_lines
+
+    Returns:
+        Dict[int, List[str]]: Line index -> variables whose tokens all appear on the line
+    """
+    label_tokens = get_label_tokens()
+    label_lines = {}
+
+    for index, line in enumerate(lines):
+        line_tokens = set(normalize_text(' '.join(word['text'] for word in line)).split())
+        matches = [
+            variable for variable, tokens in label_tokens.items()
+            if tokens and all(token in line_tokens for token in tokens)
+        ]
+        if matches:
+            label_lines[index] = matches
+
+    return label_lines
+
+def get_line_bbox(line: List[Dict]) -> Dict:
+    """Return the bounding box enclosing all words of a line"""
+    x0 = min(word['bbox']['x'] for word in line)
+    y0 = min(word['bbox']['y'] for word in line)
+    x1 = max(word['bbox']['x'] + word['bbox']['width'] for word in line)
+    y1 = max(word['bbox']['y'] + word['bbox']['height'] for word in line)
+    return {'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0}
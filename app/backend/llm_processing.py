@@ -1,7 +1,217 @@
 import requests
 import json
+import re
+import time
+import threading
+from contextlib import contextmanager
+from context_selection import estimate_tokens
 from config import LLM_CONFIG, EXTRACTION_VARIABLES
 
+FENCE_PATTERN = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL)
+WORD_PATTERN = re.compile(r'^(?:[^\W\d_]+|\d+(?:[.,]\d+)?%?)[.,:;]?$')
+
+class LLMRouter:
+    """
+    Route LLM requests across several OpenAI-compatible backends
+    
+    Each backend belongs to a tier: short, clean pages go to the "small" tier
+    and everything else to the "large" tier. Within a tier the replica with the
+    fewest requests in flight from this process is chosen first; the other
+    replicas and then the other tier are used as fallbacks. A backend that fails
+    is put on cooldown for a while and only tried again when nothing else is left.
+    """
+    
+    def __init__(self, backends):
+        """
+        Initialize the router
+        
+        Args:
+            backends (list): Dicts with NAME, API_URL, MODEL and TIER
+        """
+        self.backends = backends
+        self.in_flight = {backend['NAME']: 0 for backend in backends}
+        self.failed_until = {backend['NAME']: 0.0 for backend in backends}
+        self.supports_response_format = {backend['NAME']: True for backend in backends}
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def select_tier(text):
+        """Choose "small" for short pages with little OCR noise, "large" otherwise"""
+        routing = LLM_CONFIG["ROUTING"]
+        words = text.split()
+        if not words or estimate_tokens(text) > routing["SMALL_MAX_TOKENS"]:
+            return "large"
+        
+        noise_ratio = sum(1 for word in words if not WORD_PATTERN.match(word)) / len(words)
+        return "small" if noise_ratio <= routing["MAX_NOISE_RATIO"] else "large"
+    
+    def candidates(self, text):
+        """
+        Order backends for a request: preferred tier first, least loaded first, failed last
+        
+        Args:
+            text (str): Page text sent to the LLM
+            
+        Returns:
+            list: Backends in the order they should be tried
+        """
+        tier = self.select_tier(text)
+        now = time.monotonic()
+        
+        with self._lock:
+            # Rotate the starting point so equally loaded replicas share the work
+            self._next = (self._next + 1) % len(self.backends)
+            rotated = self.backends[self._next:] + self.backends[:self._next]
+            
+            return sorted(rotated, key=lambda backend: (
+                self.failed_until[backend['NAME']] > now,
+                backend.get('TIER', 'large') != tier,
+                self.in_flight[backend['NAME']]
+            ))
+    
+    @contextmanager
+    def track(self, backend):
+        """Count a request as in flight on a backend while it runs"""
+        with self._lock:
+            self.in_flight[backend['NAME']] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight[backend['NAME']] -= 1
+    
+    def mark_failed(self, backend):
+        """Put a backend on cooldown after an error or timeout"""
+        with self._lock:
+            self.failed_until[backend['NAME']] = time.monotonic() + LLM_CONFIG["ROUTING"]["COOLDOWN"]
+    
+    def get_status(self):
+        """Return the load and health of every backend"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    'name': backend['NAME'],
+                    'model': backend['MODEL'],
+                    'tier': backend.get('TIER', 'large'),
+                    'in_flight': self.in_flight[backend['NAME']],
+                    'healthy': self.failed_until[backend['NAME']] <= now
+                }
+                for backend in self.backends
+            ]
+
+router = LLMRouter(LLM_CONFIG["BACKENDS"] or [{
+    "NAME": "default",
+    "API_URL": LLM_CONFIG["API_URL"],
+    "MODEL": LLM_CONFIG["MODEL"],
+    "TIER": "large"
+}])
+
+def get_model_signature():
+    """Return the configured models, used to invalidate cached extraction results"""
+    return ','.join(sorted({backend['MODEL'] for backend in router.backends}))
+
+def build_extraction_schema():
+    """Build the JSON schema of the expected LLM answer from EXTRACTION_VARIABLES"""
+    return {
+        "type": "object",
+        "properties": {
+            "fields": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "enum": EXTRACTION_VARIABLES},
+                        "value": {"type": "string"}
+                    },
+                    "required": ["name", "value"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["fields"],
+        "additionalProperties": False
+    }
+
+def build_response_format(mode):
+    """
+    Build the OpenAI-compatible response_format constraint
+    
+    Args:
+        mode (str): "json_schema", "json_object" or "none"
+        
+    Returns:
+        dict: response_format value, or None for unconstrained decoding
+    """
+    if mode == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "echo_extraction",
+                "schema": build_extraction_schema(),
+                "strict": True
+            }
+        }
+    if mode == "json_object":
+        return {"type": "json_object"}
+    return None
+
+def validate_extraction(parsed):
+    """Return parsed data with well-formed fields only, or None if it has no fields list"""
+    if not isinstance(parsed, dict) or not isinstance(parsed.get('fields'), list):
+        return None
+    
+    fields = [
+        {"name": str(field['name']), "value": str(field['value'])}
+        for field in parsed['fields']
+        if isinstance(field, dict) and 'name' in field and 'value' in field
+    ]
+    return {"fields": fields}
+
+def parse_llm_content(content):
+    """
+    Parse the LLM answer, salvaging JSON wrapped in prose or fences, or cut off
+    
+    Args:
+        content (str): Raw message content returned by the LLM
+        
+    Returns:
+        dict: Extraction with a "fields" list, or None if no valid JSON was found
+    """
+    candidates = [content] + FENCE_PATTERN.findall(content)
+    
+    for candidate in candidates:
+        try:
+            result = validate_extraction(json.loads(candidate))
+            if result is not None:
+                return result
+        except json.JSONDecodeError:
+            pass
+    
+    # Decode the first complete JSON object found anywhere in the text, and
+    # keep the complete field objects of an answer that was cut off
+    decoder = json.JSONDecoder()
+    partial_fields = []
+    start = content.find('{')
+    while start != -1:
+        try:
+            parsed, end = decoder.raw_decode(content, start)
+        except json.JSONDecodeError:
+            start = content.find('{', start + 1)
+            continue
+        
+        result = validate_extraction(parsed)
+        if result is not None:
+            return result
+        if isinstance(parsed, dict) and 'name' in parsed and 'value' in parsed:
+            partial_fields.append(parsed)
+        start = content.find('{', end)
+    
+    if partial_fields:
+        return validate_extraction({'fields': partial_fields})
+    return None
+
 def structure_text(text_data):
     """
     Process text data with an LLM to extract structured medical information
@@ -10,11 +220,10 @@ def structure_text(text_data):
         text_data (str): Text to analyze for medical values
         
     Returns:
-        dict: Structured data with extracted fields
+        dict: Structured data with extracted fields, or None if every attempt failed
+              (an empty "fields" list means the LLM found no values in the text)
     """
     try:
-        url = LLM_CONFIG["API_URL"]
-        
         prompt = f"""
         Analise o seguinte texto médico e extraia informações médicas importantes relacionadas a ecocardiograma.
         Mantenha todos os nomes de variáveis e valores em português brasileiro.
@@ -39,7 +248,6 @@ def structure_text(text_data):
         """
         
         data = {
-            "model": LLM_CONFIG["MODEL"],
             "messages": [
                 {
                     "role": "system",
@@ -53,25 +261,57 @@ def structure_text(text_data):
             "stream": False
         }
 
-        response = requests.post(url=url, json=data)
+        response_format = build_response_format(LLM_CONFIG["STRUCTURED_OUTPUT"])
+        candidates = router.candidates(text_data)
         
-        # Check for successful response
-        if response.status_code != 200:
-            print(f"Error: LLM API returned status code {response.status_code}")
-            return {"fields": []}
+        for attempt in range(1, LLM_CONFIG["MAX_ATTEMPTS"] + 1):
+            # Move on to the next backend after each failed attempt
+            backend = candidates[(attempt - 1) % len(candidates)]
+            data["model"] = backend["MODEL"]
+            
+            if response_format and router.supports_response_format[backend['NAME']]:
+                data["response_format"] = response_format
+            else:
+                data.pop("response_format", None)
+            
+            start = time.perf_counter()
+            try:
+                with router.track(backend):
+                    response = requests.post(url=backend["API_URL"], json=data, timeout=LLM_CONFIG["TIMEOUT"])
+            except requests.RequestException as e:
+                print(f"Error: LLM API request to {backend['NAME']} failed (attempt {attempt}): {str(e)}")
+                router.mark_failed(backend)
+                continue
+            
+            # Servers without structured output support reject the constraint
+            if response.status_code == 400 and "response_format" in data:
+                print(f"LLM API {backend['NAME']} rejected response_format, retrying without it: {response.text}")
+                router.supports_response_format[backend['NAME']] = False
+                candidates.insert(attempt, backend)
+                continue
             
-        response_json = response.json()
-        content = response_json['choices'][0]['message']['content']
+            # Check for successful response
+            if response.status_code != 200:
+                print(f"Error: LLM API {backend['NAME']} returned status code {response.status_code} (attempt {attempt})")
+                router.mark_failed(backend)
+                continue
+                
+            response_json = response.json()
+            usage = response_json.get('usage', {})
+            print(f"LLM call to {backend['NAME']} ({backend['MODEL']}): "
+                  f"{usage.get('prompt_tokens', '?')} prompt tokens, "
+                  f"{usage.get('completion_tokens', '?')} completion tokens, "
+                  f"{time.perf_counter() - start:.2f}s")
+            content = response_json['choices'][0]['message']['content']
+            
+            # Parse the JSON content
+            parsed_content = parse_llm_content(content)
+            if parsed_content is not None:
+                return parsed_content
+            print(f"Error: Failed to parse LLM response as JSON (attempt {attempt}): {content}")
         
-        # Parse the JSON content
-        try:
-            parsed_content = json.loads(content)
-            return parsed_content
-        except json.JSONDecodeError:
-            print(f"Error: Failed to parse LLM response as JSON: {content}")
-            return {"fields": []}
+        return None
         
     except Exception as e:
         print(f"Error in structure_text: {str(e)}")
-        # Return empty result in case of error
-        return {"fields": []}
\ No newline at end of file
+        return None
\ No newline at end of file
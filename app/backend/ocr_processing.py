@@ -1,25 +1,95 @@
 import cv2
 import numpy as np
 from PIL import Image, ImageDraw
-import pytesseract
-import boto3
 from dotenv import load_dotenv
-from config import OCR_CONFIG, AWS_CONFIG, FILE_CONFIG
+from config import OCR_CONFIG, AWS_CONFIG, FILE_CONFIG, ASSET_CONFIG
+import io
 import os
+import time
+import hashlib
+import importlib
 import tempfile
+import threading
 from contextlib import contextmanager
 
-# For docling OCR method
-from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.datamodel.base_models import InputFormat
-from docling.backend.pypdfium2_backend import PyPdfiumDocumentBackend
-
 # Load environment variables for AWS credentials
 load_dotenv()
 
 OCR_VARIANT = OCR_CONFIG["VARIANT"]
-RESOURCES_DIR = 'frontend/static/ressources'
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frontend', 'static', 'ressources')
+
+# OCR Backend Registry
+# Heavy OCR dependencies (docling pulls in torch/transformers) are only imported
+# when their variant is first selected, keeping startup fast for the others.
+OCR_BACKEND_MODULES = {
+    "tesseract": ["pytesseract"],
+    "docling": [
+        "pytesseract",
+        "docling.document_converter",
+        "docling.datamodel.pipeline_options",
+        "docling.datamodel.base_models",
+        "docling.backend.pypdfium2_backend"
+    ],
+    "aws": ["boto3"],
+    "adaptive": ["pytesseract"]
+}
+
+_loaded_modules = {}
+_backend_status = {}
+_backend_lock = threading.Lock()
+
+def load_ocr_backend(variant):
+    """
+    Import the modules needed by an OCR variant, once, and record how long it took
+    
+    Args:
+        variant (str): OCR variant name
+        
+    Returns:
+        dict: Imported modules keyed by module name
+    """
+    if variant not in OCR_BACKEND_MODULES:
+        raise ValueError(f"Unknown OCR variant: {variant}")
+    
+    with _backend_lock:
+        status = _backend_status.get(variant)
+        if status and status['ready']:
+            return _loaded_modules
+        
+        import_times = {}
+        try:
+            for module_name in OCR_BACKEND_MODULES[variant]:
+                if module_name not in _loaded_modules:
+                    start = time.perf_counter()
+                    _loaded_modules[module_name] = importlib.import_module(module_name)
+                    import_times[module_name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            _backend_status[variant] = {'ready': False, 'error': str(e), 'import_ms': import_times}
+            raise
+        
+        _backend_status[variant] = {
+            'ready': True,
+            'import_ms': import_times,
+            'total_import_ms': round(sum(import_times.values()), 1)
+        }
+        return _loaded_modules
+
+def get_ocr_backend_status(variant=OCR_VARIANT):
+    """Return readiness and import timings of an OCR variant"""
+    status = _backend_status.get(variant, {'ready': False})
+    return {'variant': variant, **status}
+
+def warm_up_ocr_backend(variant=OCR_VARIANT):
+    """Import the OCR backend in a background thread so the first request is not slowed down"""
+    def warm_up():
+        try:
+            load_ocr_backend(variant)
+        except Exception as e:
+            print(f"Error warming up OCR backend {variant}: {str(e)}")
+    
+    thread = threading.Thread(target=warm_up, daemon=True)
+    thread.start()
+    return thread
 
 def create_word_object(text, confidence, bbox, color):
     """Create a word object with consistent structure"""
@@ -75,40 +145,95 @@ def temp_image_file(img):
             os.close(temp_fd)
             os.remove(temp_path)
 
-def process_word_objects(words_data, scale_factor=1):
-    """Process word data into word objects with confidence scores"""
-    word_objects = []
-    total_confidence = 0
-    word_count = 0
+def build_word_objects(texts, confidences, lefts, tops, widths, heights, scale_factor=1):
+    """
+    Build word objects from column arrays of OCR output
     
-    for word in words_data:
-        if not word['text'].strip() or word.get('confidence', -1) == -1:
-            continue
-            
-        confidence = float(word['confidence'])
-        word_count += 1
-        total_confidence += confidence
+    Filtering of empty or unrecognized (-1) words, bbox scaling, colors and
+    the mean confidence are computed on NumPy arrays for the whole page at once.
+    
+    Args:
+        texts (list): Word texts
+        confidences (list): Word confidences, -1 for non-word entries
+        lefts, tops, widths, heights (list): Bounding boxes in OCR image coordinates
+        scale_factor (float): Factor the OCR image was upscaled by
         
-        # Apply scaling to all bounding box coordinates
-        bbox = word['bbox']
-        word_obj = create_word_object(
-            text=word['text'],
+    Returns:
+        tuple: (word_objects, mean_confidence)
+    """
+    if len(texts) == 0:
+        return [], 0.0
+    
+    text_array = np.asarray(texts, dtype=str)
+    confidence_array = np.asarray(confidences, dtype=np.float64)
+    keep = (confidence_array != -1) & (np.char.str_len(np.char.strip(text_array)) > 0)
+    
+    if not keep.any():
+        return [], 0.0
+    
+    kept_confidences = confidence_array[keep]
+    
+    # Scale all bounding boxes back to original image coordinates (truncating like int())
+    boxes = np.column_stack([lefts, tops, widths, heights])[keep] / scale_factor
+    boxes = np.trunc(boxes).astype(np.int64)
+    
+    colors = np.where(kept_confidences >= OCR_CONFIG["CONFIDENCE_THRESHOLD"], "green", "red")
+    
+    word_objects = [
+        create_word_object(
+            text=text,
             confidence=confidence,
-            bbox={
-                "x": int(bbox['x'] / scale_factor),
-                "y": int(bbox['y'] / scale_factor),
-                "width": int(bbox['width'] / scale_factor),
-                "height": int(bbox['height'] / scale_factor)
-            },
-            color=get_word_color(confidence)
+            bbox={"x": x, "y": y, "width": width, "height": height},
+            color=color
         )
-        word_objects.append(word_obj)
+        for text, confidence, (x, y, width, height), color in zip(
+            text_array[keep].tolist(),
+            kept_confidences.tolist(),
+            boxes.tolist(),
+            colors.tolist()
+        )
+    ]
     
-    mean_confidence = total_confidence / word_count if word_count > 0 else 0.0
-    return word_objects, mean_confidence
+    return word_objects, float(kept_confidences.mean())
+
+def process_word_objects(words_data, scale_factor=1):
+    """Process word data dicts into word objects with confidence scores"""
+    return build_word_objects(
+        [word['text'] for word in words_data],
+        [word.get('confidence', -1) for word in words_data],
+        [word['bbox']['x'] for word in words_data],
+        [word['bbox']['y'] for word in words_data],
+        [word['bbox']['width'] for word in words_data],
+        [word['bbox']['height'] for word in words_data],
+        scale_factor
+    )
+
+def tesseract_data_to_word_objects(boxes_data, scale_factor=1):
+    """Build word objects directly from Tesseract image_to_data output columns"""
+    return build_word_objects(
+        boxes_data['text'],
+        boxes_data['conf'],
+        boxes_data['left'],
+        boxes_data['top'],
+        boxes_data['width'],
+        boxes_data['height'],
+        scale_factor
+    )
+
+def tesseract_data_to_text(boxes_data):
+    """Rebuild page text from Tesseract image_to_data output, one line per OCR line"""
+    lines = {}
+    for i, text in enumerate(boxes_data['text']):
+        if not text.strip():
+            continue
+        line_key = (boxes_data['block_num'][i], boxes_data['par_num'][i], boxes_data['line_num'][i])
+        lines.setdefault(line_key, []).append(text)
+    
+    return '\n'.join(' '.join(words) for words in lines.values())
 
 def process_tesseract_ocr(img):
     """Process image using Tesseract OCR"""
+    pytesseract = load_ocr_backend("tesseract")["pytesseract"]
     enhanced_image, scale_factor = enhance_image(img)
     pil_image = Image.fromarray(enhanced_image)
     
@@ -116,28 +241,21 @@ def process_tesseract_ocr(img):
     extracted_text = pytesseract.image_to_string(pil_image, config='--psm 6 --oem 3')
     boxes_data = pytesseract.image_to_data(pil_image, output_type=pytesseract.Output.DICT)
     
-    # Convert Tesseract data to word objects
-    words_data = [
-        {
-            'text': boxes_data['text'][i],
-            'confidence': boxes_data['conf'][i],
-            'bbox': {
-                'x': boxes_data['left'][i],
-                'y': boxes_data['top'][i],
-                'width': boxes_data['width'][i],
-                'height': boxes_data['height'][i]
-            }
-        }
-        for i in range(len(boxes_data['text']))
-    ]
-    
-    # Process results with scaling
-    word_objects, mean_confidence = process_word_objects(words_data, scale_factor)
+    # Convert Tesseract data to word objects, with scaling
+    word_objects, mean_confidence = tesseract_data_to_word_objects(boxes_data, scale_factor)
     
     return {'text': extracted_text, 'word_objects': word_objects, 'mean_confidence': mean_confidence}
 
 def process_docling_ocr(img):
     """Process image using Docling OCR"""
+    modules = load_ocr_backend("docling")
+    pytesseract = modules["pytesseract"]
+    DocumentConverter = modules["docling.document_converter"].DocumentConverter
+    PdfFormatOption = modules["docling.document_converter"].PdfFormatOption
+    PdfPipelineOptions = modules["docling.datamodel.pipeline_options"].PdfPipelineOptions
+    InputFormat = modules["docling.datamodel.base_models"].InputFormat
+    PyPdfiumDocumentBackend = modules["docling.backend.pypdfium2_backend"].PyPdfiumDocumentBackend
+    
     try:
         with temp_image_file(img) as temp_path:
             # Configure and run Docling
@@ -166,21 +284,7 @@ def process_docling_ocr(img):
     boxes_data = pytesseract.image_to_data(pil_image, output_type=pytesseract.Output.DICT)
     
     # Convert to word objects
-    words_data = [
-        {
-            'text': boxes_data['text'][i],
-            'confidence': boxes_data['conf'][i],
-            'bbox': {
-                'x': boxes_data['left'][i],
-                'y': boxes_data['top'][i],
-                'width': boxes_data['width'][i],
-                'height': boxes_data['height'][i]
-            }
-        }
-        for i in range(len(boxes_data['text']))
-    ]
-    
-    word_objects, mean_confidence = process_word_objects(words_data, scale_factor)
+    word_objects, mean_confidence = tesseract_data_to_word_objects(boxes_data, scale_factor)
     
     return {
         'text': docling_text if docling_text else ' '.join([w['text'] for w in word_objects]),
@@ -193,6 +297,7 @@ def process_aws_ocr(img):
     if not AWS_CONFIG["ACCESS_KEY"] or not AWS_CONFIG["SECRET_KEY"]:
         raise ValueError("AWS credentials not found in configuration")
     
+    boto3 = load_ocr_backend("aws")["boto3"]
     textract = boto3.client(
         'textract',
         aws_access_key_id=AWS_CONFIG["ACCESS_KEY"],
@@ -231,8 +336,173 @@ def process_aws_ocr(img):
     
     return {'text': extracted_text, 'word_objects': word_objects, 'mean_confidence': mean_confidence}
 
+def build_reocr_composite(gray, bboxes, scale):
+    """
+    Tile upscaled, binarized word crops into one image, one crop per row
+    
+    Args:
+        gray (np.ndarray): Grayscale page image
+        bboxes (list): Word bounding boxes in page coordinates
+        scale (float): Upscaling applied to each crop
+        
+    Returns:
+        tuple: (composite image, list of (top, bottom) rows per bbox)
+    """
+    settings = OCR_CONFIG["ADAPTIVE"]
+    padding = settings["PADDING"]
+    gap = settings["TILE_GAP"]
+    
+    tiles = []
+    for bbox in bboxes:
+        x0 = max(bbox['x'] - padding, 0)
+        y0 = max(bbox['y'] - padding, 0)
+        x1 = min(bbox['x'] + bbox['width'] + padding, gray.shape[1])
+        y1 = min(bbox['y'] + bbox['height'] + padding, gray.shape[0])
+        crop = gray[y0:y1, x0:x1]
+        if crop.size == 0:
+            tiles.append(None)
+            continue
+        scaled = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        _, binary = cv2.threshold(scaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        tiles.append(binary)
+    
+    # Stack the tiles on a white page, separated by blank rows so each is its own text line
+    width = max((tile.shape[1] for tile in tiles if tile is not None), default=0) + 2 * gap
+    height = sum(tile.shape[0] + gap for tile in tiles if tile is not None) + gap
+    composite = np.full((height, width), 255, dtype=np.uint8)
+    
+    rows = []
+    y = gap
+    for tile in tiles:
+        if tile is None:
+            rows.append(None)
+            continue
+        composite[y:y + tile.shape[0], gap:gap + tile.shape[1]] = tile
+        rows.append((y, y + tile.shape[0]))
+        y += tile.shape[0] + gap
+    
+    return composite, rows
+
+def reocr_regions(pytesseract, gray, bboxes, scale):
+    """
+    Re-OCR word regions with stronger preprocessing, in a single Tesseract call
+    
+    pytesseract starts a tesseract process for every call, so the crops are
+    tiled into one composite image and the recognized words are mapped back
+    to their crop by vertical position.
+    
+    Args:
+        pytesseract (module): Loaded pytesseract module
+        gray (np.ndarray): Grayscale page image
+        bboxes (list): Word bounding boxes in page coordinates
+        scale (float): Upscaling applied to each crop
+        
+    Returns:
+        list: (text, confidence) per bbox, or None where nothing was recognized
+    """
+    if not bboxes:
+        return []
+    
+    settings = OCR_CONFIG["ADAPTIVE"]
+    composite, rows = build_reocr_composite(gray, bboxes, scale)
+    boxes_data = pytesseract.image_to_data(
+        Image.fromarray(composite),
+        config=f'--psm {settings["REOCR_PSM"]} --oem 3',
+        output_type=pytesseract.Output.DICT
+    )
+    
+    # Assign each recognized word to the tile containing its vertical center
+    words = [[] for _ in bboxes]
+    for i, text in enumerate(boxes_data['text']):
+        conf = float(boxes_data['conf'][i])
+        if not text.strip() or conf == -1:
+            continue
+        center = boxes_data['top'][i] + boxes_data['height'][i] / 2
+        for index, row in enumerate(rows):
+            if row and row[0] <= center < row[1]:
+                words[index].append((boxes_data['left'][i], text, conf))
+                break
+    
+    results = []
+    for tile_words in words:
+        if not tile_words:
+            results.append(None)
+            continue
+        tile_words.sort()
+        results.append((
+            ' '.join(text for _, text, _ in tile_words),
+            sum(conf for _, _, conf in tile_words) / len(tile_words)
+        ))
+    
+    return results
+
+def process_adaptive_ocr(img):
+    """
+    Process image with a fast Tesseract pass, then re-OCR only low-confidence words
+    
+    The first pass runs on the grayscale page with a light upscale and no
+    filtering. Words below the confidence threshold are cropped, upscaled,
+    binarized and recognized again together in one composite image; the
+    better reading of each word is kept. A page costs two Tesseract calls.
+    """
+    pytesseract = load_ocr_backend("adaptive")["pytesseract"]
+    settings = OCR_CONFIG["ADAPTIVE"]
+    threshold = OCR_CONFIG["CONFIDENCE_THRESHOLD"]
+    
+    # Fast first pass
+    scale_factor = settings["FIRST_PASS_SCALE"]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(gray, None, fx=scale_factor, fy=scale_factor, interpolation=cv2.INTER_CUBIC)
+    boxes_data = pytesseract.image_to_data(
+        Image.fromarray(gray),
+        config='--psm 6 --oem 3',
+        output_type=pytesseract.Output.DICT
+    )
+    
+    # Targeted second pass, lowest confidence first
+    candidates = sorted(
+        (
+            i for i, text in enumerate(boxes_data['text'])
+            if text.strip() and -1 < float(boxes_data['conf'][i]) < threshold
+        ),
+        key=lambda i: float(boxes_data['conf'][i])
+    )[:settings["MAX_REGIONS"]]
+    
+    # Crops are taken from the upscaled page, so only the remaining factor is applied
+    bboxes = [
+        {
+            'x': boxes_data['left'][i],
+            'y': boxes_data['top'][i],
+            'width': boxes_data['width'][i],
+            'height': boxes_data['height'][i]
+        }
+        for i in candidates
+    ]
+    reocr_results = reocr_regions(pytesseract, gray, bboxes, settings["REOCR_SCALE"] / scale_factor)
+    
+    for i, reocr_result in zip(candidates, reocr_results):
+        if reocr_result and reocr_result[1] > float(boxes_data['conf'][i]):
+            boxes_data['text'][i], boxes_data['conf'][i] = reocr_result
+    
+    # Merge both passes
+    word_objects, mean_confidence = tesseract_data_to_word_objects(boxes_data, scale_factor)
+    
+    return {
+        'text': tesseract_data_to_text(boxes_data),
+        'word_objects': word_objects,
+        'mean_confidence': mean_confidence
+    }
+
 def save_annotated_image(img, word_objects, filename):
-    """Save image with word bounding boxes"""
+    """
+    Save image with word bounding boxes under a content-hashed name
+    
+    The boxes depend on the OCR result, so the hash is taken from the
+    annotated image itself: a new OCR result always gets a new URL.
+    
+    Returns:
+        str: Filename of the annotated image in the resources directory
+    """
     pil_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
     drawer = ImageDraw.Draw(pil_image)
     
@@ -246,24 +516,71 @@ def save_annotated_image(img, word_objects, filename):
             bbox['y'] + bbox['height'] + padding
         ], outline=word['color'], width=1)
     
-    save_path = os.path.join(RESOURCES_DIR, f'preprocessed_{filename}')
-    pil_image.save(save_path, quality=95)
+    stem, ext = os.path.splitext(f'preprocessed_{filename}')
+    buffer = io.BytesIO()
+    pil_image.save(buffer, format=Image.registered_extensions().get(ext.lower(), 'JPEG'), quality=95)
+    content_hash = hashlib.sha256(buffer.getvalue()).hexdigest()[:ASSET_CONFIG["HASH_LENGTH"]]
+    
+    annotated_name = f"{stem}.{content_hash}{ext}"
+    save_path = os.path.join(RESOURCES_DIR, annotated_name)
+    with open(save_path, 'wb') as f:
+        f.write(buffer.getvalue())
     print(f"Saved annotated image to: {save_path}")
+    return annotated_name
+
+def process_ocr_regions(processor, img, regions):
+    """
+    Run an OCR processor on selected regions of an image only
+    
+    Args:
+        processor (callable): OCR processing function for a full image
+        img (np.ndarray): Page image
+        regions (list): Pixel bounding boxes to OCR
+        
+    Returns:
+        dict: Merged OCR result with bboxes in page coordinates
+    """
+    texts = []
+    word_objects = []
+    
+    for region in regions:
+        crop = img[region['y']:region['y'] + region['height'], region['x']:region['x'] + region['width']]
+        if crop.size == 0:
+            continue
+        
+        region_result = processor(crop)
+        texts.append(region_result['text'])
+        
+        # Move bboxes back into page coordinates
+        for word in region_result['word_objects']:
+            word['bbox']['x'] += region['x']
+            word['bbox']['y'] += region['y']
+        word_objects.extend(region_result['word_objects'])
+    
+    confidences = [word['confidence'] for word in word_objects]
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    
+    return {'text': '\n'.join(texts), 'word_objects': word_objects, 'mean_confidence': mean_confidence}
 
-def perform_ocr_processing(img, filename=None):
+def perform_ocr_processing(img, filename=None, regions=None):
     """Main OCR processing function that routes to the appropriate OCR engine"""
     ocr_processors = {
         "tesseract": process_tesseract_ocr,
         "docling": process_docling_ocr,
-        "aws": process_aws_ocr
+        "aws": process_aws_ocr,
+        "adaptive": process_adaptive_ocr
     }
     
     if OCR_VARIANT not in ocr_processors:
         raise ValueError(f"Unknown OCR variant: {OCR_VARIANT}")
     
-    result = ocr_processors[OCR_VARIANT](img)
+    if regions:
+        result = process_ocr_regions(ocr_processors[OCR_VARIANT], img, regions)
+    else:
+        result = ocr_processors[OCR_VARIANT](img)
     
+    result['annotated_image'] = None
     if filename and result['word_objects']:
-        save_annotated_image(img, result['word_objects'], filename)
+        result['annotated_image'] = save_annotated_image(img, result['word_objects'], filename)
     
     return result
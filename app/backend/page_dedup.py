@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+from config import DEDUP_CONFIG
+
+def to_gray(img: np.ndarray) -> np.ndarray:
+    """Convert a BGR image to grayscale, leaving grayscale images unchanged"""
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+def is_blank_page(img: np.ndarray) -> bool:
+    """
+    Detect pages without content, such as scanner separator pages
+
+    Ink is measured at full resolution, so a single line of small text still
+    counts: pixels darker than the paper (the median gray level) by more than
+    BLANK_INK_CONTRAST are ink, and specks smaller than a glyph are ignored.
+    The page is blank if the remaining ink is below BLANK_INK_RATIO.
+
+    Args:
+        img (np.ndarray): Page image
+
+    Returns:
+        bool: True if the page is blank
+    """
+    gray = to_gray(img)
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    paper = int(np.searchsorted(np.cumsum(histogram), gray.size / 2))
+    ink = (gray < paper - DEDUP_CONFIG["BLANK_INK_CONTRAST"]).astype(np.uint8)
+    if not ink.any():
+        return True
+
+    # Scanner dust is a few pixels wide, glyphs grow with the rendering resolution
+    min_area = max(4, DEDUP_CONFIG["BLANK_MIN_SPECK_AREA"] * (gray.shape[1] / 612) ** 2)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    return areas[areas >= min_area].sum() / ink.size < DEDUP_CONFIG["BLANK_INK_RATIO"]
+
+def compute_dhash(img: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Compute the difference hash (dHash) of an image
+
+    Args:
+        img (np.ndarray): Page image
+        hash_size (int): Side of the hash grid, the hash has hash_size**2 bits
+
+    Returns:
+        int: Perceptual hash of the image
+    """
+    small = cv2.resize(to_gray(img), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Count the differing bits of two hashes"""
+    return bin(hash_a ^ hash_b).count('1')
+
+def pages_match(img_a: np.ndarray, img_b: np.ndarray) -> bool:
+    """
+    Confirm that two pages with close hashes are really the same page
+
+    Pages sharing a report layout but holding different values have nearly
+    identical hashes, so the pages are compared at the resolution of img_a.
+    A rescan is first aligned on img_a with a phase-correlation shift (up to
+    MAX_ALIGN_SHIFT of the page size); after a light blur, no cell of the
+    overlapping difference image may differ by more than
+    DUPLICATE_MAX_CELL_DIFF gray levels on average. A single changed digit is
+    enough to fail the check; so is a rescan that is rotated or rescaled,
+    which then simply goes through OCR again.
+
+    Args:
+        img_a (np.ndarray): Page image
+        img_b (np.ndarray): Page image
+
+    Returns:
+        bool: True if the pages are duplicates
+    """
+    cell = DEDUP_CONFIG["VERIFY_CELL_SIZE"]
+    height, width = img_a.shape[:2]
+    if abs(height / width - img_b.shape[0] / img_b.shape[1]) > 0.01 * height / width:
+        return False
+
+    gray_a = cv2.GaussianBlur(to_gray(img_a), (3, 3), 0)
+    gray_b = to_gray(img_b)
+    if gray_b.shape != gray_a.shape:
+        gray_b = cv2.resize(gray_b, (width, height), interpolation=cv2.INTER_AREA)
+    gray_b = cv2.GaussianBlur(gray_b, (3, 3), 0)
+
+    # Shift img_b onto img_a, then only compare the area both pages cover
+    (dx, dy), _ = cv2.phaseCorrelate(gray_b.astype(np.float32), gray_a.astype(np.float32))
+    max_shift = DEDUP_CONFIG["MAX_ALIGN_SHIFT"]
+    if abs(dx) > max_shift * width or abs(dy) > max_shift * height:
+        return False
+    if abs(dx) >= 0.5 or abs(dy) >= 0.5:
+        shift = np.float32([[1, 0, dx], [0, 1, dy]])
+        gray_b = cv2.warpAffine(gray_b, shift, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        margin_x, margin_y = int(np.ceil(abs(dx))) + 1, int(np.ceil(abs(dy))) + 1
+        gray_a = gray_a[margin_y:height - margin_y, margin_x:width - margin_x]
+        gray_b = gray_b[margin_y:height - margin_y, margin_x:width - margin_x]
+
+    diff = cv2.absdiff(gray_a, gray_b)
+    cells = cv2.resize(diff, (max(diff.shape[1] // cell, 1), max(diff.shape[0] // cell, 1)), interpolation=cv2.INTER_AREA)
+    return int(cells.max()) <= DEDUP_CONFIG["DUPLICATE_MAX_CELL_DIFF"]
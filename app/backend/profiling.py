@@ -0,0 +1,218 @@
+from flask import current_app as app, request, g, Blueprint, jsonify, send_from_directory, abort
+import os
+import sys
+import hmac
+import time
+import threading
+from collections import Counter
+from datetime import datetime
+from config import PROFILING_CONFIG
+
+# Create the Blueprint for profiling hooks and admin routes
+blueprint = Blueprint('profiling', __name__, url_prefix='/admin/profiles')
+
+PROFILE_SUFFIX = '.folded'
+
+class StackSampler:
+    """
+    Sample the call stack of a single thread at a fixed interval.
+
+    Stacks are aggregated in "folded" format (frame;frame;frame count), which
+    can be fed directly to flamegraph.pl, speedscope or inferno.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        """
+        Initialize the sampler for a thread
+
+        Args:
+            thread_id (int): Identifier of the thread to sample
+            interval (float): Seconds between two samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Start sampling in a background thread"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the background thread to finish"""
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        """Collect samples until stopped"""
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = os.path.splitext(os.path.basename(code.co_filename))[0]
+                stack.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def to_folded(self) -> str:
+        """Return the collected samples in folded stack format"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+# Helper Functions
+def get_profiles_dir():
+    """Return the profile ring buffer directory, creating it if needed"""
+    profiles_dir = app.config['PROFILES_DIR']
+    os.makedirs(profiles_dir, exist_ok=True)
+    return profiles_dir
+
+def list_profiles(profiles_dir):
+    """List stored profiles, newest first"""
+    profiles = [f for f in os.listdir(profiles_dir) if f.endswith(PROFILE_SUFFIX)]
+    return sorted(profiles, reverse=True)
+
+def save_profile(sampler, duration_ms, reason, endpoint, profiles_dir):
+    """Write a profile to the ring buffer and evict the oldest ones beyond the limit"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    endpoint = (endpoint or 'unknown').replace('.', '_')
+    filename = f"{timestamp}_{endpoint}_{int(duration_ms)}ms_{reason}{PROFILE_SUFFIX}"
+
+    with open(os.path.join(profiles_dir, filename), 'w', encoding='utf-8') as f:
+        f.write(sampler.to_folded())
+
+    for old_profile in list_profiles(profiles_dir)[PROFILING_CONFIG["MAX_PROFILES"]:]:
+        try:
+            os.unlink(os.path.join(profiles_dir, old_profile))
+        except OSError as e:
+            print(f"Error deleting profile {old_profile}: {str(e)}")
+
+    return filename
+
+def has_admin_token():
+    """Check the X-Admin-Token header; always False when no token is configured"""
+    token = PROFILING_CONFIG["ADMIN_TOKEN"]
+    if not token:
+        return False
+    # Compare bytes, compare_digest rejects non-ASCII str
+    value = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(value.encode('utf-8'), token.encode('utf-8'))
+
+def is_profile_forced():
+    """A profile can only be forced with the X-Profile header by an admin"""
+    return request.headers.get(PROFILING_CONFIG["HEADER"]) == '1' and has_admin_token()
+
+def should_profile():
+    """Decide whether the current request gets a sampler attached"""
+    if request.blueprint == blueprint.name:
+        return False
+    return PROFILING_CONFIG["ENABLED"] or is_profile_forced()
+
+def finish_profile(sampler, start, forced, endpoint, profiles_dir):
+    """
+    Stop a sampler and keep its profile if forced or slower than the threshold
+
+    Returns:
+        str: Filename of the saved profile, None if it was discarded
+    """
+    sampler.stop()
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    if forced:
+        reason = 'requested'
+    elif duration_ms >= PROFILING_CONFIG["LATENCY_THRESHOLD_MS"]:
+        reason = 'slow'
+    else:
+        return None
+
+    if not sampler.stacks:
+        return None
+    return save_profile(sampler, duration_ms, reason, endpoint, profiles_dir)
+
+# Request Hooks
+@blueprint.before_app_request
+def start_profiling():
+    """Attach a stack sampler to the request thread when profiling is requested"""
+    if not should_profile():
+        return
+
+    g.profile_forced = is_profile_forced()
+    g.profile_start = time.perf_counter()
+    g.profile_sampler = StackSampler(
+        threading.get_ident(),
+        PROFILING_CONFIG["SAMPLE_INTERVAL_MS"] / 1000
+    )
+    g.profile_sampler.start()
+
+@blueprint.after_app_request
+def stop_profiling(response):
+    """
+    Finish the profile of the request
+
+    Streamed bodies are only generated after this hook, so for streamed
+    responses the sampler runs until the response is closed. Their profile
+    is saved then and listed under /admin/profiles, without an X-Profile-Id
+    header since the headers have already been sent.
+    """
+    sampler = g.pop('profile_sampler', None)
+    if sampler is None:
+        return response
+
+    # Captured now, the request context is gone when a streamed response closes
+    args = (sampler, g.profile_start, g.profile_forced, request.endpoint, get_profiles_dir())
+
+    if response.is_streamed:
+        response.call_on_close(lambda: finish_profile(*args))
+        return response
+
+    filename = finish_profile(*args)
+    if filename:
+        response.headers['X-Profile-Id'] = filename
+
+    return response
+
+@blueprint.before_request
+def check_admin_token():
+    """Hide the admin routes unless a token is configured, and require it"""
+    if not PROFILING_CONFIG["ADMIN_TOKEN"]:
+        abort(404)
+    if not has_admin_token():
+        return jsonify({'success': False, 'error': 'Unauthorized'}), 401
+
+# Route Handlers
+@blueprint.route('/', methods=['GET'])
+def get_profiles():
+    """List the profiles currently held in the ring buffer"""
+    profiles_dir = get_profiles_dir()
+    profiles = [
+        {
+            'filename': filename,
+            'size': os.path.getsize(os.path.join(profiles_dir, filename))
+        }
+        for filename in list_profiles(profiles_dir)
+    ]
+
+    return jsonify({
+        'success': True,
+        'profiles': profiles
+    })
+
+@blueprint.route('/<filename>', methods=['GET'])
+def download_profile(filename):
+    """Download a profile in folded stack format"""
+    try:
+        return send_from_directory(
+            get_profiles_dir(),
+            filename,
+            as_attachment=True,
+            mimetype='text/plain'
+        )
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 404
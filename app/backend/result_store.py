@@ -0,0 +1,110 @@
+import sqlite3
+from datetime import datetime
+from typing import List, Dict, Iterator
+from contextlib import closing
+
+RESULT_COLUMNS = ['run_id', 'created_at', 'document', 'page', 'variable', 'value', 'source']
+
+class ResultStore:
+    def __init__(self, db_path: str):
+        """
+        Initialize the result store, creating the SQLite table and indexes if needed
+
+        Every extraction run appends one row per extracted field, so the full
+        history can be queried and exported without reading JSON files.
+
+        Args:
+            db_path (str): Path to the SQLite database file
+        """
+        self.db_path = db_path
+        with closing(self.connect()) as conn, conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    document TEXT NOT NULL,
+                    page INTEGER,
+                    variable TEXT NOT NULL,
+                    value TEXT,
+                    source TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_run ON results (run_id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_document ON results (document, page)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_results_variable ON results (variable)')
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection; one per operation keeps the store safe across request threads"""
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def append_run(self, run_id: str, documents: List[Dict]) -> int:
+        """
+        Append the fields of all documents of a run
+
+        Args:
+            run_id (str): Identifier of the extraction run
+            documents (List[Dict]): Documents with uploaded filename, page and fields;
+                each field source is the OCR JSON file it was extracted from
+
+        Returns:
+            int: Number of rows written
+        """
+        created_at = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (run_id, created_at, document['filename'], document.get('page'),
+             field['name'], field['value'], field.get('source'))
+            for document in documents
+            for field in document['fields']
+        ]
+
+        with closing(self.connect()) as conn, conn:
+            conn.executemany(
+                'INSERT INTO results (run_id, created_at, document, page, variable, value, source) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        return len(rows)
+
+    def list_runs(self) -> List[Dict]:
+        """List extraction runs with their row counts, newest first"""
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                'SELECT run_id, MIN(created_at), COUNT(*) FROM results GROUP BY run_id ORDER BY run_id DESC'
+            )
+            return [
+                {'run_id': run_id, 'created_at': created_at, 'rows': count}
+                for run_id, created_at, count in cursor
+            ]
+
+    def has_run(self, run_id: str) -> bool:
+        """Check whether a run has any stored rows"""
+        with closing(self.connect()) as conn:
+            return conn.execute('SELECT 1 FROM results WHERE run_id = ? LIMIT 1', (run_id,)).fetchone() is not None
+
+    def iter_batches(self, run_id: str = None, batch_size: int = 1000) -> Iterator[List[tuple]]:
+        """
+        Iterate over stored rows in batches, without loading the whole history
+
+        Args:
+            run_id (str): Only export this run; all runs when None
+            batch_size (int): Rows fetched per batch
+
+        Yields:
+            List[tuple]: Rows in RESULT_COLUMNS order
+        """
+        query = f"SELECT {', '.join(RESULT_COLUMNS)} FROM results"
+        params = ()
+        if run_id:
+            query += ' WHERE run_id = ?'
+            params = (run_id,)
+        query += ' ORDER BY id'
+
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
@@ -0,0 +1,241 @@
+import os
+import cv2
+import json
+import hashlib
+import numpy as np
+from typing import List, Dict, Optional
+from layout_analysis import group_words_into_lines, find_label_lines, get_line_bbox
+from config import TEMPLATE_CONFIG
+
+class TemplateStore:
+    def __init__(self, templates_dir: str):
+        """
+        Initialize TemplateStore and load previously learned templates
+
+        A template describes a known report layout: a low-resolution fingerprint
+        of the page, used for detection, the regions holding the measurement
+        table, stored as fractions of the page size, and the extraction
+        variables whose labels were found in them.
+
+        Args:
+            templates_dir (str): Directory where templates are stored as JSON
+        """
+        self.templates_dir = templates_dir
+        os.makedirs(self.templates_dir, exist_ok=True)
+        self.templates = self.load_templates()
+
+    def load_templates(self) -> List[Dict]:
+        """Load all templates from the templates directory"""
+        templates = []
+        for filename in sorted(os.listdir(self.templates_dir)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.templates_dir, filename), 'r', encoding='utf-8') as f:
+                    template = json.load(f)
+                template['fingerprint'] = np.array(template['fingerprint'], dtype=np.float32)
+                templates.append(template)
+            except Exception as e:
+                print(f"Error loading template {filename}: {str(e)}")
+        return templates
+
+    def save_template(self, template: Dict):
+        """Write a template to disk"""
+        path = os.path.join(self.templates_dir, f"{template['id']}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                **template,
+                'fingerprint': np.round(template['fingerprint'], 4).tolist()
+            }, f, ensure_ascii=False)
+
+    # Detection
+    @staticmethod
+    def compute_fingerprint(img: np.ndarray) -> np.ndarray:
+        """
+        Compute a layout fingerprint: a small, zero-mean, unit-norm grayscale thumbnail
+
+        Args:
+            img (np.ndarray): Page image (BGR)
+
+        Returns:
+            np.ndarray: Flattened fingerprint vector
+        """
+        size = TEMPLATE_CONFIG["FINGERPRINT_SIZE"]
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        thumbnail = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+        thumbnail -= thumbnail.mean()
+        norm = np.linalg.norm(thumbnail)
+        return (thumbnail / norm).ravel() if norm > 0 else thumbnail.ravel()
+
+    def match(self, img: np.ndarray, fingerprint: np.ndarray = None) -> Optional[Dict]:
+        """
+        Find the learned template whose layout matches a page
+
+        Args:
+            img (np.ndarray): Page image (BGR)
+            fingerprint (np.ndarray): Precomputed fingerprint of img, if available
+
+        Returns:
+            Optional[Dict]: Best matching template above the threshold, or None
+        """
+        if not self.templates:
+            return None
+
+        if fingerprint is None:
+            fingerprint = self.compute_fingerprint(img)
+
+        scores = [float(np.dot(fingerprint, t['fingerprint'])) for t in self.templates]
+        best = int(np.argmax(scores))
+        if scores[best] >= TEMPLATE_CONFIG["MATCH_THRESHOLD"]:
+            return self.templates[best]
+        return None
+
+    @staticmethod
+    def get_pixel_regions(template: Dict, image_shape: tuple) -> List[Dict]:
+        """
+        Convert a template's relative regions into pixel bounding boxes for an image
+
+        Regions always span the full page width, so values that are longer than
+        on the page the template was learned from (an extra digit, a reference
+        range) are not cut off.
+        """
+        height, width = image_shape[:2]
+        return [
+            {
+                'x': 0,
+                'y': int(region['y'] * height),
+                'width': width,
+                'height': int(region['height'] * height)
+            }
+            for region in template['regions']
+        ]
+
+    @staticmethod
+    def find_labels(word_objects: List[Dict]) -> List[str]:
+        """Return the extraction variables whose labels appear in a page"""
+        label_lines = find_label_lines(group_words_into_lines(word_objects))
+        return sorted({variable for variables in label_lines.values() for variable in variables})
+
+    def recovers_labels(self, template: Dict, word_objects: List[Dict]) -> bool:
+        """
+        Check that region OCR found most of the labels the template was learned with
+
+        Args:
+            template (Dict): Matched template
+            word_objects (List[Dict]): Word objects from OCR of the template regions
+
+        Returns:
+            bool: True if at least MIN_LABEL_RECALL of the template labels were found
+        """
+        # Templates learned before labels were recorded cannot be checked
+        expected = set(template.get('labels', []))
+        if not expected:
+            return False
+
+        found = expected & set(self.find_labels(word_objects))
+        return len(found) >= TEMPLATE_CONFIG["MIN_LABEL_RECALL"] * len(expected)
+
+    # Learning
+    @staticmethod
+    def find_regions(word_objects: List[Dict], image_shape: tuple) -> List[Dict]:
+        """
+        Find the regions holding the measurement table in a corrected page
+
+        Lines that mention extraction variables are merged into blocks when they
+        are vertically close, then padded and stored relative to the page size
+        as bands across the full page width.
+
+        Args:
+            word_objects (List[Dict]): Corrected OCR word objects
+            image_shape (tuple): Shape of the page image
+
+        Returns:
+            List[Dict]: Regions as fractions of the page width and height
+        """
+        lines = group_words_into_lines(word_objects)
+        label_lines = find_label_lines(lines)
+        if not label_lines:
+            return []
+
+        # Merge label lines into blocks
+        blocks = []
+        for index in sorted(label_lines):
+            bbox = get_line_bbox(lines[index])
+            if blocks:
+                last = blocks[-1]
+                gap = bbox['y'] - (last['y'] + last['height'])
+                if gap <= TEMPLATE_CONFIG["MERGE_GAP_LINES"] * bbox['height']:
+                    last['height'] = bbox['y'] + bbox['height'] - last['y']
+                    continue
+            blocks.append(bbox)
+
+        # Pad and normalize
+        height = image_shape[0]
+        padding = TEMPLATE_CONFIG["REGION_PADDING"]
+        regions = []
+        for block in blocks:
+            y0 = max(block['y'] / height - padding, 0.0)
+            y1 = min((block['y'] + block['height']) / height + padding, 1.0)
+            regions.append({'x': 0.0, 'y': y0, 'width': 1.0, 'height': y1 - y0})
+
+        return regions
+
+    def learn(self, img: np.ndarray, word_objects: List[Dict], source: str) -> Optional[Dict]:
+        """
+        Create or update a template from a page and its confirmed word objects
+
+        Args:
+            img (np.ndarray): Page image (BGR)
+            word_objects (List[Dict]): Confirmed OCR word objects of the page
+            source (str): Name of the page the template was learned from
+
+        Returns:
+            Optional[Dict]: The learned template, or None if no table was found
+        """
+        regions = self.find_regions(word_objects, img.shape)
+        if not regions:
+            return None
+
+        fingerprint = self.compute_fingerprint(img)
+        template = self.match(img, fingerprint)
+        labels = self.find_labels(word_objects)
+
+        if template is None:
+            template = {
+                'id': hashlib.sha1(fingerprint.tobytes()).hexdigest()[:12],
+                'fingerprint': fingerprint,
+                'regions': regions,
+                'labels': labels,
+                'sources': [source]
+            }
+            self.templates.append(template)
+        else:
+            # Keep regions and labels from earlier pages so the template only grows
+            template['regions'] = self.merge_regions(template['regions'] + regions)
+            template['labels'] = sorted(set(template.get('labels', [])) | set(labels))
+            if source not in template['sources']:
+                template['sources'].append(source)
+
+        self.save_template(template)
+        return template
+
+    @staticmethod
+    def merge_regions(regions: List[Dict]) -> List[Dict]:
+        """Merge overlapping regions into their enclosing boxes"""
+        merged = []
+        for region in sorted(regions, key=lambda r: r['y']):
+            for other in merged:
+                overlaps = (
+                    region['x'] <= other['x'] + other['width'] and other['x'] <= region['x'] + region['width'] and
+                    region['y'] <= other['y'] + other['height'] and other['y'] <= region['y'] + region['height']
+                )
+                if overlaps:
+                    x0 = min(region['x'], other['x'])
+                    y0 = min(region['y'], other['y'])
+                    x1 = max(region['x'] + region['width'], other['x'] + other['width'])
+                    y1 = max(region['y'] + region['height'], other['y'] + other['height'])
+                    other.update({'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0})
+                    break
+            else:
+                merged.append(dict(region))
+        return merged
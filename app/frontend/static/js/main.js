@@ -225,8 +225,10 @@ function showPage(filename, page, pageIndex = null) {
     imageWrapper.style.position = 'relative';
     
     const img = document.createElement('img');
-    // Keep using resources directory for main view to show annotated images
-    img.src = `/ressources/${page.preprocessed_path.split('/').pop()}`;
+    // Show the annotated image, pages without recognized words only have the preprocessed one
+    img.src = page.annotated_image
+        ? `/ressources/${page.annotated_image}`
+        : `/preprocessed/${page.preprocessed_path.split('/').pop()}`;
     img.alt = `Page ${page.page} of ${filename}`;
     
     const overlay = document.createElement('canvas');
@@ -690,12 +692,14 @@ function handleFiles(files) {
         progressBar.style.width = '100%';
         
         // Process results for each file
-        data.results.forEach((result, fileIndex) => {
+        let firstPageShown = false;
+        data.results.forEach(result => {
             const fileGroup = createFileGroup(result);
             document.getElementById('fileList').appendChild(fileGroup);
             
-            // Show first page by default for the first file
-            if (fileIndex === 0) {
+            // Show the first page of the first file that has pages left after blank page skipping
+            if (!firstPageShown && result.pages.length > 0) {
+                firstPageShown = true;
                 currentFilePages = result.pages;
                 currentPageIndex = 0;
                 currentFileName = result.filename;
@@ -828,25 +832,34 @@ function adjustInputWidth(input) {
     document.body.removeChild(tmp);
 }
 
-function getCurrentPageData() {
+function getChangedWords() {
     const wordItems = document.querySelectorAll('.word-item');
-    const updatedWordObjects = Array.from(wordItems).map(wordItem => {
+    const changes = [];
+    
+    Array.from(wordItems).forEach((wordItem, index) => {
         const wordInput = wordItem.querySelector('.word-input');
-        const originalWordObject = JSON.parse(wordItem.dataset.originalWord);
+        const savedText = wordItem.dataset.savedText ?? JSON.parse(wordItem.dataset.originalWord).text;
         
-        return {
-            ...originalWordObject,
-            text: wordInput.value // Update the text with the corrected value
-        };
+        // Only send words edited since the last save
+        if (wordInput.value !== savedText) {
+            changes.push({ index: index, text: wordInput.value });
+        }
     });
     
     return {
         filename: currentFileName,
-        page: currentPageIndex + 1,
-        word_objects: updatedWordObjects
+        page: currentFilePages[currentPageIndex].page,
+        changes: changes
     };
 }
 
+function markWordsSaved(changes) {
+    const wordItems = document.querySelectorAll('.word-item');
+    changes.forEach(change => {
+        wordItems[change.index].dataset.savedText = change.text;
+    });
+}
+
 function updateSaveStatus(filename) {
     console.log('Updating save status for:', filename);
     
@@ -872,10 +885,10 @@ function updateSaveStatus(filename) {
 function saveCorrections() {
     console.log('Save corrections clicked'); // Debug log
     
-    const correctedData = getCurrentPageData();
+    const correctedData = getChangedWords();
     
     fetch('/ocr/save-corrections', {
-        method: 'POST',
+        method: 'PATCH',
         headers: {
             'Content-Type': 'application/json'
         },
@@ -885,6 +898,7 @@ function saveCorrections() {
     .then(data => {
         if (data.success) {
             console.log('Save successful, updating status...'); // Debug log
+            markWordsSaved(correctedData.changes);
             savedCorrections.add(currentFileName);
             updateLlmProcessingButton();
             showToast('Changes saved successfully!', 'success');
@@ -1381,7 +1395,7 @@ function createPageElement(pageNumber, preprocessedPath) {
     const thumbnail = document.createElement('img');
     thumbnail.className = 'page-thumbnail';
     const filename = preprocessedPath.split('/').pop();
-    thumbnail.src = `/preprocessed/${filename}`; // Use preprocessed images for thumbnails
+    thumbnail.src = `/thumbnails/${filename}`; // Use downscaled WebP copies for thumbnails
     thumbnail.alt = `Page ${pageNumber} preview`;
     
     // Add click handler for preview - also show preprocessed image in modal